@@ -1,24 +1,50 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
+from stats import StatsRecorder
+from columnar import open_columns
 
 def aggregate_stats(stats_list):
-    """Convert a list of per-frame stats dicts to a dict of lists for plotting/analysis."""
-    keys = stats_list[0].keys()
-    agg = {k: [] for k in keys}
+    """Convert a list of per-frame stats dicts to column arrays (a StatsRecorder) for plotting/analysis.
+
+    Long runs should attach a StatsRecorder to the Runner instead of keeping the list at all.
+    """
+    recorder = StatsRecorder(chunk=max(1, len(stats_list)))
     for s in stats_list:
-        for k in keys:
-            agg[k].append(s[k])
-    return agg
+        recorder.append(s)
+    return recorder
+
+def load_stats(path):
+    """Memory-map a ColumnWriter run directory as a dict of column arrays, ready for the plot functions."""
+    return open_columns(path)
+
+def quantile_band(stats, key):
+    """(lowest, highest) <key>_qNN columns of ensemble bands, or None for a single run."""
+    names = sorted(k for k in stats if k.startswith(f'{key}_q') and k[len(key) + 2:].isdigit())
+    if len(names) < 2:
+        return None
+    return stats[names[0]], stats[names[-1]]
 
 def plot_population_dynamics(stats):
+    """Population counts per frame; for ensemble bands (EnsembleStats.bands) the mean with its
+    outer quantile band, and the extinction probability on a second axis."""
     frames = stats['frame']
-    plt.figure(figsize=(10, 5))
-    plt.plot(frames, stats['herbivores'], label='Herbivores', color='blue')
-    plt.plot(frames, stats['carnivores'], label='Carnivores', color='red')
-    plt.xlabel('Frame')
-    plt.ylabel('Population')
-    plt.legend()
+    fig, ax = plt.subplots(figsize=(10, 5))
+    for key, label, color in (('herbivores', 'Herbivores', 'blue'), ('carnivores', 'Carnivores', 'red')):
+        ax.plot(frames, stats[key], label=label, color=color)
+        band = quantile_band(stats, key)
+        if band is not None:
+            ax.fill_between(frames, band[0], band[1], color=color, alpha=0.2)
+    ax.set_xlabel('Frame')
+    ax.set_ylabel('Population')
+    ax.legend(loc='upper left')
+    if 'extinct_herbivores' in stats:
+        ax2 = ax.twinx()
+        ax2.plot(frames, stats['extinct_herbivores'], color='blue', linestyle=':', label='P(herbivores extinct)')
+        ax2.plot(frames, stats['extinct_carnivores'], color='red', linestyle=':', label='P(carnivores extinct)')
+        ax2.set_ylim(0, 1)
+        ax2.set_ylabel('Extinction probability')
+        ax2.legend(loc='upper right')
     plt.title('Population Dynamics')
     plt.tight_layout()
     plt.show()
@@ -38,7 +64,7 @@ def plot_trait_evolution(stats, trait):
     plt.show()
 
 def save_stats_to_csv(stats, filename='simulation_stats.csv'):
-    df = pd.DataFrame(stats)
+    df = pd.DataFrame(dict(stats))
     df.to_csv(filename, index=False)
     print(f"Saved statistics to {filename}")
 
@@ -46,5 +72,7 @@ def save_stats_to_csv(stats, filename='simulation_stats.csv'):
 # stats_list = [grid.get_stats(frame) for frame in range(num_frames)]
 # agg_stats = aggregate_stats(stats_list)
 # plot_population_dynamics(agg_stats)
+# or record while running: agg_stats = runner.attach(StatsRecorder()); runner.run(num_frames, collect=False)
+# or stream to disk: runner.attach(ColumnWriter("run_stats")), then later agg_stats = load_stats("run_stats")
 # plot_trait_evolution(agg_stats, 'speed')
 # save_stats_to_csv(agg_stats)
@@ -0,0 +1,75 @@
+import argparse
+import gc
+import time
+import tracemalloc
+import numpy as np
+from organism import Organism, HERBIVORE_PRIOR, CARNIVORE_PRIOR, divide_all
+from traits import ACCEPTANCE, sample_allocations, mutate_allocations
+
+
+def organism_memory(n=20000, generation=5):
+    """Average bytes held per live Organism, measured with tracemalloc."""
+    results = {}
+    # warm up lazy imports and class-level tables before measuring
+    Organism(0, 0, 50, cannibalism=True, generation=generation)
+    Organism(0, 0, 50, cannibalism=False, generation=generation)
+    for label, cannibalism in (("herbivore", False), ("carnivore", True)):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        organisms = [Organism(i % 50, (i // 50) % 50, 50, cannibalism=cannibalism, generation=generation)
+                     for i in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[label] = (after - before) / n
+        del organisms
+    return results
+
+
+def births(n=20000, generation=5, batch=100):
+    """Births per second through Organism.division and divide_all (in frames of `batch` parents),
+    against constructing each child with Organism()."""
+    results = {}
+    for label, cannibalism in (("herbivore", False), ("carnivore", True)):
+        parent = Organism(25, 25, 50, cannibalism=cannibalism, generation=generation)
+        start = time.perf_counter()
+        for _ in range(n):
+            parent.division()
+        results[f"{label} division"] = n / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(n // batch):
+            divide_all([parent] * batch)
+        results[f"{label} divide_all"] = (n // batch) * batch / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(n):
+            Organism(25, 25, 50, cannibalism=cannibalism, generation=generation + 1)
+        results[f"{label} constructor"] = n / (time.perf_counter() - start)
+    return results
+
+
+def trait_sampling(n=20000, seed=0):
+    """Allocations per second from the batch samplers, with their acceptance rates."""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for label, prior in (("herbivore", HERBIVORE_PRIOR), ("carnivore", CARNIVORE_PRIOR)):
+        start = time.perf_counter()
+        allocs = sample_allocations(prior, n, rng)
+        results[f"{label} prior"] = n / (time.perf_counter() - start)
+        start = time.perf_counter()
+        mutate_allocations(allocs, rng)
+        results[f"{label} mutation"] = n / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the organism model.")
+    parser.add_argument("-n", type=int, default=20000)
+    args = parser.parse_args()
+    for label, size in organism_memory(args.n).items():
+        print(f"{label}: {size:.0f} bytes/organism")
+    for label, rate in births(args.n).items():
+        print(f"{label}: {rate:,.0f} births/s")
+    for label, rate in trait_sampling(args.n).items():
+        print(f"{label}: {rate:,.0f} allocations/s")
+    for label, acceptance in ACCEPTANCE.items():
+        print(f"{label} acceptance: {acceptance.rate:.3f} ({acceptance.accepted}/{acceptance.proposed})")
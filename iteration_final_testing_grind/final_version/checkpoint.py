@@ -0,0 +1,115 @@
+import os
+import pickle
+import threading
+import zlib
+from organism import Organism
+
+FORMAT_VERSION = 4
+MAGIC = b"GRIDCKPT"
+# Organism class attributes that belong to a run rather than to the class
+ORGANISM_STATE = ("_id_counter", "rng", "mutation_rng")
+
+
+def snapshot(grid, frame):
+    """The complete state of a run about to simulate `frame`, as bytes.
+
+    The grid is pickled together with the Organism class state (id counter
+    and both RandomBlocks, pre-drawn variates included) in a single dump, so
+    an organism referenced from both the organisms list and the
+    identity-keyed carnivore_last_meal_time comes back as one object.
+    """
+    state = {
+        "version": FORMAT_VERSION,
+        "frame": frame,
+        "engine": "arrays" if grid.population is not None else "objects",
+        "organism": {name: getattr(Organism, name) for name in ORGANISM_STATE},
+        "grid": grid,
+    }
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_snapshot(payload, path, level=1):
+    """Compress a snapshot and put it at `path` atomically: written to a temp file, synced, renamed."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(zlib.compress(payload, level))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_checkpoint(grid, frame, path):
+    write_snapshot(snapshot(grid, frame), path)
+
+
+def load_checkpoint(path):
+    """Restore a checkpoint: returns (grid, frame, engine) and reinstates the Organism class state.
+
+    Continuing with the same engine from `frame` reproduces the original run
+    exactly.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a grid checkpoint")
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state["version"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported checkpoint version {state['version']}")
+    for name, value in state["organism"].items():
+        setattr(Organism, name, value)
+    return state["grid"], state["frame"], state["engine"]
+
+
+class Checkpointer:
+    """Runner observer that checkpoints the run to `path` every `every` frames.
+
+    Only the pickling happens on the simulation thread; compression, the
+    write and the rename run on a background thread while the run carries on.
+    A checkpoint still being written when the next one is due is waited for,
+    and a failed write is raised on the simulation thread at the next
+    checkpoint or at close().
+
+    `stores` (ColumnWriter, TrajectoryRecorder) are flushed before each
+    checkpoint, so what they hold on disk always reaches the checkpointed
+    frame and a resumed run can continue them without a gap; attach them
+    before the Checkpointer so they have seen the frame by then.
+    """
+
+    def __init__(self, path, every=1000, level=1, stores=()):
+        self.path = path
+        self.every = every
+        self.level = level
+        self.stores = list(stores)
+        self.saved = 0
+        self._thread = None
+        self._error = None
+
+    def __call__(self, grid, frame, stats):
+        if (frame + 1) % self.every == 0:
+            self.save(grid, frame + 1)
+
+    def save(self, grid, frame):
+        self.wait()
+        for store in self.stores:
+            store.flush()
+        payload = snapshot(grid, frame)
+        self._thread = threading.Thread(target=self._write, args=(payload,), daemon=True)
+        self._thread.start()
+
+    def _write(self, payload):
+        try:
+            write_snapshot(payload, self.path, self.level)
+            self.saved += 1
+        except Exception as e:
+            self._error = e
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        self.wait()
@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+from stats import column_dtype
+
+HEADER = "header.json"
+FORMAT_VERSION = 1
+
+
+class ColumnWriter:
+    """Runner observer appending per-frame stats to one raw `<column>.bin` file per column.
+
+    `resume` continues an existing directory from that frame instead of overwriting it.
+    """
+
+    def __init__(self, path, chunk=1024, resume=None):
+        self.path = path
+        self.chunk = chunk
+        self.frames = 0
+        self._buffers = {}
+        self._files = {}
+        self._pending = 0
+        os.makedirs(path, exist_ok=True)
+        if resume is not None and os.path.exists(os.path.join(path, HEADER)):
+            self._reopen(resume)
+
+    def _reopen(self, frame):
+        columns = open_columns(self.path)
+        recorded = columns["frame"]
+        kept = int(np.searchsorted(recorded, frame))
+        if kept and recorded[kept - 1] != frame - 1:
+            raise ValueError(f"{self.path} stops at frame {recorded[kept - 1]}, cannot continue at frame {frame}")
+        dtypes = {key: column.dtype for key, column in columns.items()}
+        del columns, recorded
+        for key, dtype in dtypes.items():
+            filename = os.path.join(self.path, f"{key}.bin")
+            with open(filename, "ab") as f:
+                f.truncate(kept * dtype.itemsize)
+            self._buffers[key] = np.empty(self.chunk, dtype=dtype)
+            self._files[key] = open(filename, "ab")
+        self.frames = kept
+        self._write_header()
+
+    def _open(self, stats):
+        for key, value in stats.items():
+            dtype = column_dtype(value).newbyteorder("<")
+            self._buffers[key] = np.empty(self.chunk, dtype=dtype)
+            self._files[key] = open(os.path.join(self.path, f"{key}.bin"), "wb")
+        self._write_header()
+
+    def _write_header(self):
+        header = {
+            "version": FORMAT_VERSION,
+            "frames": self.frames,
+            "columns": {key: buf.dtype.str for key, buf in self._buffers.items()},
+        }
+        tmp = os.path.join(self.path, HEADER + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp, os.path.join(self.path, HEADER))
+
+    def append(self, stats):
+        if not self._buffers:
+            self._open(stats)
+        i = self._pending
+        for key, buf in self._buffers.items():
+            buf[i] = stats[key]
+        self._pending += 1
+        if self._pending == self.chunk:
+            self.flush()
+
+    def __call__(self, grid, frame, stats):
+        self.append(stats)
+
+    def flush(self):
+        """Write out buffered frames and publish them in the header."""
+        if not self._pending:
+            return
+        for key, buf in self._buffers.items():
+            f = self._files[key]
+            f.write(buf[:self._pending].tobytes())
+            f.flush()
+        self.frames += self._pending
+        self._pending = 0
+        self._write_header()
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_columns(path):
+    """The header's complete frames of a ColumnWriter directory as read-only np.memmap arrays, keyed by name."""
+    with open(os.path.join(path, HEADER)) as f:
+        header = json.load(f)
+    frames = header["frames"]
+    columns = {}
+    for key, dtype in header["columns"].items():
+        if frames == 0:
+            columns[key] = np.empty(0, dtype=dtype)
+        else:
+            columns[key] = np.memmap(os.path.join(path, f"{key}.bin"), dtype=dtype, mode="r", shape=(frames,))
+    return columns
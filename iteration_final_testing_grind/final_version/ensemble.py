@@ -0,0 +1,250 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from batch import BatchGrid
+from runner import Runner
+from stats import StatsRecorder, TRACKED_TRAITS, SPECIES
+from sweep import build, check_params, parse_value
+
+COUNTS = ("herbivores", "carnivores")
+DEFAULT_KEYS = COUNTS + tuple(f"mean_{trait}_{species}" for trait in TRACKED_TRAITS for species in SPECIES)
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+
+
+def quantile_key(key, p):
+    return f"{key}_q{round(100 * p):02d}"
+
+
+class P2Quantile:
+    """P² estimate (Jain and Chlamtac) of the p-quantile of every row, from five markers per row."""
+
+    def __init__(self, p, n):
+        self.p = p
+        self.step = np.array([0, p / 2, p, (1 + p) / 2, 1])
+        self.q = np.zeros((n, 5))
+        self.pos = np.zeros((n, 5))
+        self.desired = np.zeros((n, 5))
+
+    def start(self, rows, sample):
+        m = sample.shape[1]
+        idx = np.round((m - 1) * self.step).astype(np.int64)
+        # markers need distinct positions; tail quantiles of small samples round together
+        for i in (1, 2, 3):
+            idx[i] = max(idx[i], idx[i - 1] + 1)
+        for i in (3, 2, 1):
+            idx[i] = min(idx[i], idx[i + 1] - 1)
+        self.q[rows] = sample[:, idx]
+        self.pos[rows] = idx + 1
+        self.desired[rows] = 1 + (m - 1) * self.step
+
+    def update(self, rows, x):
+        q, pos, desired = self.q[rows], self.pos[rows], self.desired[rows]
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        k = np.minimum((x[:, None] >= q[:, 1:5]).sum(axis=1), 3)
+        pos += np.arange(5) > k[:, None]
+        desired += self.step
+        for i in (1, 2, 3):
+            d = desired[:, i] - pos[:, i]
+            move = ((d >= 1) & (pos[:, i + 1] - pos[:, i] > 1)) | ((d <= -1) & (pos[:, i - 1] - pos[:, i] < -1))
+            if not move.any():
+                continue
+            s = np.sign(d[move])
+            qm, qi, qp = q[move, i - 1], q[move, i], q[move, i + 1]
+            nm, ni, np_ = pos[move, i - 1], pos[move, i], pos[move, i + 1]
+            parabolic = qi + s / (np_ - nm) * ((ni - nm + s) * (qp - qi) / (np_ - ni)
+                                               + (np_ - ni - s) * (qi - qm) / (ni - nm))
+            q_next = np.where(s > 0, qp, qm)
+            n_next = np.where(s > 0, np_, nm)
+            linear = qi + s * (q_next - qi) / (n_next - ni)
+            q[move, i] = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+            pos[move, i] += s
+        self.q[rows], self.pos[rows], self.desired[rows] = q, pos, desired
+
+    def value(self):
+        return self.q[:, 2]
+
+
+class QuantileBands:
+    """Quantiles per row: exact from the first `exact` values, P2Quantile estimates past that; NaNs skipped."""
+
+    def __init__(self, quantiles, n, exact=16):
+        self.quantiles = tuple(quantiles)
+        self.exact = max(5, exact)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.sample = np.zeros((n, self.exact))
+        self.estimators = [P2Quantile(p, n) for p in self.quantiles]
+
+    def add(self, x):
+        x = np.asarray(x, dtype=float)
+        valid = ~np.isnan(x)
+        rows = np.flatnonzero(valid & (self.count >= self.exact))
+        filling = np.flatnonzero(valid & (self.count < self.exact))
+        if len(filling):
+            self.sample[filling, self.count[filling]] = x[filling]
+            self.count[filling] += 1
+            full = filling[self.count[filling] == self.exact]
+            if len(full):
+                self.sample[full] = np.sort(self.sample[full], axis=1)
+                for estimator in self.estimators:
+                    estimator.start(full, self.sample[full])
+        if len(rows):
+            for estimator in self.estimators:
+                estimator.update(rows, x[rows])
+            self.count[rows] += 1
+
+    def values(self):
+        """One array per quantile, in the order given."""
+        out = [estimator.value().copy() for estimator in self.estimators]
+        # up to `exact` values the stored sample is the whole row, so its quantiles are exact
+        for c in np.unique(self.count[self.count <= self.exact]):
+            rows = self.count == c
+            exact = np.quantile(self.sample[rows, :c], self.quantiles, axis=1) if c else np.nan
+            for j in range(len(out)):
+                out[j][rows] = exact[j] if c else np.nan
+        return out
+
+
+class EnsembleStats:
+    """Per-frame mean, std, quantile bands and extinct fractions over replicate series, folded in online by add().
+
+    NaN values (no organisms of that species) are left out of that frame.
+    """
+
+    def __init__(self, frames, keys=DEFAULT_KEYS, quantiles=DEFAULT_QUANTILES, exact=16):
+        self.frames = np.arange(frames)
+        self.keys = tuple(keys)
+        self.quantiles = tuple(quantiles)
+        self.replicates = 0
+        self._n = {key: np.zeros(frames, dtype=np.int64) for key in self.keys}
+        self._mean = {key: np.zeros(frames) for key in self.keys}
+        self._m2 = {key: np.zeros(frames) for key in self.keys}
+        self._q = {key: QuantileBands(self.quantiles, frames, exact) for key in self.keys}
+        self._extinct = {key: np.zeros(frames, dtype=np.int64) for key in COUNTS if key in self.keys}
+
+    def add(self, series):
+        for key in self.keys:
+            x = np.asarray(series[key], dtype=float)
+            valid = ~np.isnan(x)
+            n = self._n[key]
+            n += valid
+            delta = np.where(valid, x - self._mean[key], 0.0)
+            self._mean[key] += np.divide(delta, n, out=np.zeros_like(delta), where=n > 0)
+            self._m2[key] += np.where(valid, delta * (x - self._mean[key]), 0.0)
+            self._q[key].add(x)
+            if key in self._extinct:
+                self._extinct[key] += x == 0
+        self.replicates += 1
+
+    def bands(self):
+        """get_stats-shaped columns: the ensemble mean per key, with <key>_std, <key>_qNN and extinct_<species>."""
+        out = {"frame": self.frames}
+        for key in self.keys:
+            n = self._n[key]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[key] = np.where(n > 0, self._mean[key], np.nan)
+                out[f"{key}_std"] = np.where(n > 1, np.sqrt(self._m2[key] / (n - 1)), np.nan)
+            for p, values in zip(self.quantiles, self._q[key].values()):
+                out[quantile_key(key, p)] = values
+        for key, extinct in self._extinct.items():
+            out[f"extinct_{key}"] = extinct / max(1, self.replicates)
+        return out
+
+
+def replicate(params, frames, engine, keys):
+    """One replicate's get_stats series for `keys`, run to the full length."""
+    runner = Runner(build(params), engine=engine)
+    recorder = runner.attach(StatsRecorder(chunk=frames))
+    runner.run(frames, collect=False)
+    return {key: np.array(recorder[key]) for key in keys}
+
+
+def replicate_batch(runs, frames, keys):
+    """replicate() for several runs at once, advanced together by one BatchGrid."""
+    batch = BatchGrid([build(params) for params in runs])
+    series = {key: np.empty((frames, len(runs))) for key in keys}
+    for frame in range(frames):
+        batch.step(frame)
+        columns = batch.stats_columns(frame)
+        for key in keys:
+            series[key][frame] = columns[key]
+    return [{key: series[key][:, r] for key in keys} for r in range(len(runs))]
+
+
+def replicate_seeds(seed, replicates):
+    """Distinct run seeds for the replicates of an ensemble, derived from one seed."""
+    return np.random.SeedSequence(seed).generate_state(replicates).tolist()
+
+
+def run_ensemble(params, replicates, frames=2000, engine="arrays", workers=None, seed=0,
+                 keys=DEFAULT_KEYS, quantiles=DEFAULT_QUANTILES, batch=16, log=print):
+    """Run `replicates` seeded copies of one configuration in worker processes and return their EnsembleStats.
+
+    Replicate i runs with the i-th of replicate_seeds(seed, replicates) and is folded in in order.
+    """
+    check_params([params])
+    if "seed" in params:
+        raise ValueError("replicate seeds come from the ensemble seed; drop 'seed' from params")
+    ensemble = EnsembleStats(frames, keys, quantiles)
+    workers = workers or os.cpu_count() or 1
+    per_task = batch if engine == "batch" else 1
+    waiting = {}
+    futures = {}
+    submitted = 0
+    runs = [{**params, "seed": s} for s in replicate_seeds(seed, replicates)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while ensemble.replicates < replicates:
+            while submitted < replicates and submitted < ensemble.replicates + workers * per_task:
+                if engine == "batch":
+                    future = pool.submit(replicate_batch, runs[submitted:submitted + batch], frames, keys)
+                else:
+                    future = pool.submit(replicate, runs[submitted], frames, engine, keys)
+                futures[future] = submitted
+                submitted += per_task
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                first = futures.pop(future)
+                for j, series in enumerate(result if engine == "batch" else [result]):
+                    waiting[first + j] = series
+            while ensemble.replicates in waiting:
+                ensemble.add(waiting.pop(ensemble.replicates))
+                log(f"replicate {ensemble.replicates}/{replicates} folded in")
+    return ensemble
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run seeded replicates of one configuration and plot their bands.")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--replicates", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=("objects", "arrays", "batch"), default="arrays")
+    parser.add_argument("--batch", type=int, default=16, help="replicates per BatchGrid with --engine batch")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--csv", help="write the bands to this CSV file")
+    parser.add_argument("--plot", action="store_true", help="plot the population bands")
+    args = parser.parse_args(argv)
+
+    params = {}
+    for item in args.param:
+        name, _, value = item.partition("=")
+        params[name] = parse_value(value)
+
+    start = time.perf_counter()
+    ensemble = run_ensemble(params, args.replicates, args.frames, args.engine, args.workers, args.seed,
+                            batch=args.batch, log=lambda message: None)
+    print(f"{args.replicates} replicates in {time.perf_counter() - start:.1f}s")
+    bands = ensemble.bands()
+    if args.csv:
+        from analysis import save_stats_to_csv
+        save_stats_to_csv(bands, args.csv)
+    if args.plot:
+        from analysis import plot_population_dynamics
+        plot_population_dynamics(bands)
+
+
+if __name__ == "__main__":
+    main()
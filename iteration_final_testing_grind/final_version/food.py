@@ -0,0 +1,212 @@
+import heapq
+from collections import deque
+import numpy as np
+
+UNREACHED = np.iinfo(np.int32).max
+NO_FOOD = -1
+
+
+class NearestFoodField:
+    """Distance to and flat index (x * size + y) of the nearest food cell, per lattice cell.
+
+    Ties go to the lowest index; NO_FOOD labels cells when there is no food.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.dist = np.full((size, size), UNREACHED, dtype=np.int32)
+        self.label = np.full((size, size), NO_FOOD, dtype=np.int64)
+        self._dist = self.dist.reshape(-1)
+        self._label = self.label.reshape(-1)
+
+    def __getstate__(self):
+        # the flat views would unpickle as copies detached from dist and label
+        state = self.__dict__.copy()
+        del state["_dist"], state["_label"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._dist = self.dist.reshape(-1)
+        self._label = self.label.reshape(-1)
+
+    def _neighbours(self, c):
+        size = self.size
+        x, y = divmod(c, size)
+        if x > 0:
+            yield c - size
+        if x < size - 1:
+            yield c + size
+        if y > 0:
+            yield c - 1
+        if y < size - 1:
+            yield c + 1
+
+    def rebuild(self, cells):
+        self._dist[:] = UNREACHED
+        self._label[:] = NO_FOOD
+        queue = deque()
+        for c in cells:
+            self._dist[c] = 0
+            self._label[c] = c
+            queue.append(c)
+        self._flood(queue)
+
+    def _flood(self, queue):
+        dist, label = self._dist, self._label
+        while queue:
+            c = queue.popleft()
+            d, lab = dist[c] + 1, label[c]
+            for n in self._neighbours(c):
+                if d < dist[n] or (d == dist[n] and lab < label[n]):
+                    dist[n] = d
+                    label[n] = lab
+                    queue.append(n)
+
+    def add(self, c):
+        if self._dist[c] == 0:
+            return
+        self._dist[c] = 0
+        self._label[c] = c
+        self._flood(deque([c]))
+
+    def remove(self, c):
+        dist, label = self._dist, self._label
+        if label[c] != c:
+            return
+        # cells owned by c form a connected region around it
+        region = [c]
+        label[c] = NO_FOOD
+        i = 0
+        while i < len(region):
+            for n in self._neighbours(region[i]):
+                if label[n] == c:
+                    label[n] = NO_FOOD
+                    region.append(n)
+            i += 1
+        for r in region:
+            dist[r] = UNREACHED
+        # re-flood the region from its frontier in order of distance
+        heap = []
+        for r in region:
+            for n in self._neighbours(r):
+                if label[n] != NO_FOOD:
+                    d, lab = dist[n] + 1, label[n]
+                    if d < dist[r] or (d == dist[r] and lab < label[r]):
+                        dist[r] = d
+                        label[r] = lab
+        for r in region:
+            if label[r] != NO_FOOD:
+                heapq.heappush(heap, (int(dist[r]), int(label[r]), r))
+        while heap:
+            d, lab, r = heapq.heappop(heap)
+            if d != dist[r] or lab != label[r]:
+                continue
+            for n in self._neighbours(r):
+                if d + 1 < dist[n] or (d + 1 == dist[n] and lab < label[n]):
+                    dist[n] = d + 1
+                    label[n] = lab
+                    heapq.heappush(heap, (d + 1, lab, n))
+
+    def nearest(self, x, y):
+        c = self.label[x, y]
+        if c == NO_FOOD:
+            return None
+        return divmod(int(c), self.size)
+
+
+class FoodStore:
+    """Food cells as an occupancy bitmap plus an insertion-ordered set, with a NearestFoodField kept in sync.
+
+    Iterates (x, y) tuples in spawn order, as the old list did.
+    """
+
+    def __init__(self, size, positions=()):
+        self.size = size
+        self.occupied = np.zeros((size, size), dtype=bool)
+        self._cells = {}
+        for pos in positions:
+            pos = (int(pos[0]), int(pos[1]))
+            self._cells[pos] = None
+            self.occupied[pos] = True
+        self.field = NearestFoodField(size)
+        self.field.rebuild(x * size + y for x, y in self._cells)
+
+    def __contains__(self, pos):
+        return pos in self._cells
+
+    def __iter__(self):
+        return iter(self._cells)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def count(self):
+        return len(self._cells)
+
+    def eat(self, pos):
+        """Remove food at pos; returns False if there was none."""
+        if pos not in self._cells:
+            return False
+        del self._cells[pos]
+        self.occupied[pos] = False
+        if self.field is not None:
+            self.field.remove(int(pos[0]) * self.size + int(pos[1]))
+        return True
+
+    def spawn(self, pos):
+        """Place food at pos; returns False if the cell already has food."""
+        pos = (int(pos[0]), int(pos[1]))
+        if pos in self._cells:
+            return False
+        self._cells[pos] = None
+        self.occupied[pos] = True
+        if self.field is not None:
+            self.field.add(pos[0] * self.size + pos[1])
+        return True
+
+    def adopt(self, occupied):
+        """Keep the occupancy bitmap in the given (size, size) array, e.g. a BatchFood slice, and drop the field."""
+        occupied[...] = self.occupied
+        self.occupied = occupied
+        self.field = None
+
+    def nearest(self, x, y):
+        """Closest food cell to (x, y) by Manhattan distance, or None."""
+        return self.field.nearest(x, y)
+
+    def xy(self):
+        """Food positions as an (F, 2) integer array in iteration order."""
+        return np.array(list(self._cells), dtype=np.int64).reshape(-1, 2)
+
+
+class RespawnQueue:
+    """Eaten food cells waiting to respawn, in a heap keyed by the frame they were eaten."""
+
+    def __init__(self):
+        self.pending = {}  # pos -> frame it was eaten
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __contains__(self, pos):
+        return pos in self.pending
+
+    def schedule(self, pos, frame):
+        self.pending[pos] = frame
+        heapq.heappush(self._heap, (frame, self._seq, pos))
+        self._seq += 1
+
+    def pop_due(self, frame, delay):
+        """Remove and return the cells with frame - eaten_frame >= delay, oldest first."""
+        due = []
+        heap = self._heap
+        while heap and frame - heap[0][0] >= delay:
+            eaten, _, pos = heapq.heappop(heap)
+            # a cell eaten again after an early refill leaves a stale entry behind
+            if self.pending.get(pos) == eaten:
+                del self.pending[pos]
+                due.append(pos)
+        return due
@@ -1,25 +1,29 @@
-import random
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from organism import Organism
+from organism import Organism, share_carnivore_knowledge, divide_all
+from population import Population, NO_FRAME
+from spatial import SpatialHash
+from food import FoodStore, RespawnQueue
+from rng import RandomBlock, ReplicateRandom, make_streams
+from stats import RunningStats
 
 class Grid:
-    def __init__(self, size, num_organisms, num_food, food_seed=42):
+    def __init__(self, size, num_organisms, num_food, food_seed=42, verbose=True, seed=None):
         self.size = size
+        self.seed = seed
+        self.verbose = verbose
         self.organisms = []
         self.time_steps = 0
         self.last_food_spawn_time = 0
         self.num_food = num_food
         self.food_seed = food_seed
         self.fixed_food_positions = self.generate_fixed_food()
-        self.food_positions = list(self.fixed_food_positions)
+        self.food_positions = FoodStore(size, self.fixed_food_positions)
         self.food_touch_time = {}
         self.carnivore_division_probab = 0.1
         self.carnivore_last_meal_time = {}
         self.carnivore_starvation_time = 150
 
-        self.food_respawn_timer = {}
+        self.food_respawn_timer = RespawnQueue()
         self.food_respawn_delay = 200
 
         self.food_event = "normal"
@@ -28,6 +32,23 @@ class Grid:
         self.base_food_respawn_delay = 200
         self.base_num_food = num_food
 
+        # neighbour index used by Organism flee/hunt/communication queries
+        self.index = SpatialHash(size)
+
+        # food refills and food events draw from their own streams of the run seed;
+        # the array engine's movement and mutation streams match Organism.reset(seed)
+        streams = make_streams(seed)
+        self.food_rng = RandomBlock(streams["food"])
+        self.events = RandomBlock(streams["events"])
+        self.rng = streams["movement"]
+        self.mutation_rng = streams["mutation"]
+
+        # per-species trait aggregates behind get_stats, updated as organisms come, go and change
+        self.running = RunningStats()
+
+        # structure-of-arrays engine state, created on the first call to step()
+        self.population = None
+
     def generate_fixed_food(self):
         rng = np.random.default_rng(self.food_seed)
         return [tuple(pos) for pos in rng.integers(0, self.size, (self.num_food, 2))]
@@ -37,33 +58,35 @@ class Grid:
 
     def add_organisms(self, organisms):
         self.organisms = organisms
+        self.running.rebuild(organisms)
         for org in organisms:
             if hasattr(org, "cannibalism") and org.cannibalism:
                 self.carnivore_last_meal_time[org] = 0
 
     def trigger_food_event(self):
-        if self.food_event_timer == 0 and random.random() < 0.01:
-            event = random.choices(
+        if self.food_event_timer == 0 and self.events.random() < 0.01:
+            event = self.events.weighted_choice(
                 ["drought", "abundance", "normal"],
                 weights=[0.2, 0.15, 0.65]
-            )[0]
+            )
             if event == "drought":
                 self.food_event = "drought"
-                self.food_event_duration = random.randint(200, 400)
+                self.food_event_duration = self.events.integers(200, 401)
                 self.food_respawn_delay = int(self.base_food_respawn_delay * 2.5)
                 self.num_food = max(5, int(self.base_num_food * 0.4))
             elif event == "abundance":
                 self.food_event = "abundance"
-                self.food_event_duration = random.randint(150, 300)
+                self.food_event_duration = self.events.integers(150, 301)
                 self.food_respawn_delay = int(self.base_food_respawn_delay * 0.5)
                 self.num_food = int(self.base_num_food * 1.5)
             else:
                 self.food_event = "normal"
-                self.food_event_duration = random.randint(300, 600)
+                self.food_event_duration = self.events.integers(300, 601)
                 self.food_respawn_delay = self.base_food_respawn_delay
                 self.num_food = self.base_num_food
             self.food_event_timer = self.food_event_duration
-            print(f"Food event triggered: {self.food_event} for {self.food_event_duration} frames.")
+            if self.verbose:
+                print(f"Food event triggered: {self.food_event} for {self.food_event_duration} frames.")
 
         if self.food_event_timer > 0:
             self.food_event_timer -= 1
@@ -71,109 +94,143 @@ class Grid:
                 self.food_event = "normal"
                 self.food_respawn_delay = self.base_food_respawn_delay
                 self.num_food = self.base_num_food
-                print("Food event ended, returning to normal.")
+                if self.verbose:
+                    print("Food event ended, returning to normal.")
 
     def update(self, frame, herbivore_scatter, carnivore_scatter, food_scatter):
+        self.advance(frame)
+        if herbivore_scatter is not None and carnivore_scatter is not None and food_scatter is not None:
+            return self.render(herbivore_scatter, carnivore_scatter, food_scatter)
+
+    def advance(self, frame):
+        """Advance the object engine by one frame without touching any artists."""
         self.trigger_food_event()
+        Organism.rng.reserve(uniforms=8 * len(self.organisms), normals=len(self.organisms))
 
-        new_organisms = []
-        to_remove = []
+        parents = []
+        to_remove = set()
 
+        self.index.rebuild(self.organisms)
+        share_carnivore_knowledge([o for o in self.organisms if not o.cannibalism], self.index)
+        running = self.running
         for org in self.organisms:
-            org.move(self.food_positions, self.organisms)
+            old_x, old_y = org.x, org.y
+            # the only tracked traits move() can change
+            food_gene, energy_efficiency = org.food_gene, org.energy_efficiency
+            org.move(self.food_positions, self.organisms, index=self.index)
+            self.index.move(org, old_x, old_y)
+            if org.food_gene != food_gene:
+                running.change(org, "food_gene", food_gene, org.food_gene)
+            if org.energy_efficiency != energy_efficiency:
+                running.change(org, "energy_efficiency", energy_efficiency, org.energy_efficiency)
             pos = (org.x, org.y)
 
             if org.is_dead():
-                to_remove.append(org)
+                to_remove.add(org)
                 continue
 
             if not org.cannibalism:
-                if pos in self.food_positions:
-                    self.food_positions.remove(pos)
-                    self.food_respawn_timer[pos] = frame
+                if self.food_positions.eat(pos):
+                    self.food_respawn_timer.schedule(pos, frame)
                     self.food_touch_time[org] = frame
 
                 if org in self.food_touch_time and frame - self.food_touch_time[org] >= 5:
-                    new_organisms.append(org.division())
+                    parents.append(org)
                     del self.food_touch_time[org]
 
             else:
                 fed = False
-                for target in self.organisms:
-                    if not target.cannibalism and (target.x, target.y) == pos and target not in to_remove:
-                        to_remove.append(target)
-                        fed = True
-                        self.carnivore_last_meal_time[org] = frame
-                        org.rest_timer = 10
-                        if random.random() < self.carnivore_division_probab:
-                            new_organisms.append(org.division())
-                        break
+                prey = [o for o in self.index.at(org.x, org.y, carnivore=False) if o not in to_remove]
+                if prey:
+                    target = prey[0]
+                    to_remove.add(target)
+                    fed = True
+                    self.carnivore_last_meal_time[org] = frame
+                    org.rest_timer = 10
+                    if Organism.mutation_rng.random() < self.carnivore_division_probab:
+                        parents.append(org)
 
                 if org in self.carnivore_last_meal_time and frame - self.carnivore_last_meal_time[org] >= self.carnivore_starvation_time:
-                    to_remove.append(org)
-
-        for org in to_remove:
-            if org in self.organisms:
-                self.organisms.remove(org)
-            self.food_touch_time.pop(org, None)
-            self.carnivore_last_meal_time.pop(org, None)
-
+                    to_remove.add(org)
+
+        removed = []
+        if to_remove:
+            # walk the removed in list order, not set order, so running sums
+            # accumulate identically in every process
+            removed = [o for o in self.organisms if o in to_remove]
+            self.organisms = [o for o in self.organisms if o not in to_remove]
+            for org in removed:
+                self.food_touch_time.pop(org, None)
+                self.carnivore_last_meal_time.pop(org, None)
+                running.remove(org)
+
+        # everyone who divided this frame reproduces in one batch
+        new_organisms = divide_all(parents)
         self.organisms.extend(new_organisms)
         for new_org in new_organisms:
+            running.add(new_org)
             if hasattr(new_org, "cannibalism") and new_org.cannibalism:
                 self.carnivore_last_meal_time[new_org] = frame
 
-        to_respawn = [pos for pos, eaten_frame in self.food_respawn_timer.items()
-                      if frame - eaten_frame >= self.food_respawn_delay]
-        for pos in to_respawn:
-            if pos not in self.food_positions:
-                self.food_positions.append(pos)
-            del self.food_respawn_timer[pos]
+        self.respawn_food(frame)
+
+    def positions(self, carnivore):
+        """(N, 2) array of herbivore or carnivore positions, whichever engine is in use."""
+        if self.population is not None:
+            pop = self.population
+            mask = pop.carnivore if carnivore else ~pop.carnivore
+            return np.c_[pop.x[mask], pop.y[mask]]
+        return np.array([(o.x, o.y) for o in self.organisms if bool(o.cannibalism) == carnivore]).reshape(-1, 2)
+
+    def render(self, herbivore_scatter, carnivore_scatter, food_scatter):
+        herbivore_scatter.set_offsets(self.positions(carnivore=False))
+        carnivore_scatter.set_offsets(self.positions(carnivore=True))
+        food_scatter.set_offsets(self.food_positions.xy())
+        return herbivore_scatter, carnivore_scatter, food_scatter
+
+    def respawn_food(self, frame):
+        for pos in self.food_respawn_timer.pop_due(frame, self.food_respawn_delay):
+            self.food_positions.spawn(pos)
 
         while len(self.food_positions) < self.num_food:
             tries = 0
             while True:
-                new_pos = (random.randint(0, self.size-1), random.randint(0, self.size-1))
-                if new_pos not in self.food_positions:
-                    self.food_positions.append(new_pos)
+                new_pos = (self.food_rng.integers(0, self.size), self.food_rng.integers(0, self.size))
+                if self.food_positions.spawn(new_pos):
                     break
                 tries += 1
                 if tries > 10 * self.size:
                     break
 
-        if herbivore_scatter is not None and carnivore_scatter is not None and food_scatter is not None:
-            herb_x, herb_y = zip(*[(o.x, o.y) for o in self.organisms if not o.cannibalism]) if any(
-                not o.cannibalism for o in self.organisms) else ([], [])
-            carn_x, carn_y = zip(*[(o.x, o.y) for o in self.organisms if o.cannibalism]) if any(
-                o.cannibalism for o in self.organisms) else ([], [])
-            food_x, food_y = zip(*self.food_positions) if self.food_positions else ([], [])
-
-            herbivore_scatter.set_offsets(np.c_[herb_x, herb_y])
-            carnivore_scatter.set_offsets(np.c_[carn_x, carn_y])
-            food_scatter.set_offsets(np.c_[food_x, food_y])
-
-            return herbivore_scatter, carnivore_scatter, food_scatter
+    def step(self, frame):
+        """Vectorized counterpart of update() that advances the whole population at once.
+
+        The organisms are moved into a Population store on the first call; from
+        then on self.population is authoritative and self.organisms is left empty.
+        """
+        if self.population is None:
+            self.population = Population.from_organisms(
+                self.organisms, self.size, self.food_touch_time, self.carnivore_last_meal_time)
+            self.population.next_id[0] = Organism._id_counter
+            self.organisms = []
+            self.food_touch_time = {}
+            self.carnivore_last_meal_time = {}
+            self.population.stats = self.running
+            self.population.rebuild_stats()
+        food = self.food_positions
+        step_population([self], self.population, food.occupied[None], food.field.label[None],
+                        ReplicateRandom([self.rng]), ReplicateRandom([self.mutation_rng]), frame)
 
     def get_stats(self, frame):
-        herbivores = [o for o in self.organisms if not o.cannibalism]
-        carnivores = [o for o in self.organisms if o.cannibalism]
-        stats = {
-            'frame': frame,
-            'herbivores': len(herbivores),
-            'carnivores': len(carnivores),
-        }
-        for trait in ['speed', 'lifespan', 'food_gene', 'energy_efficiency']:
-            if herbivores:
-                stats[f'mean_{trait}_herb'] = np.mean([getattr(o, trait, np.nan) for o in herbivores])
-            else:
-                stats[f'mean_{trait}_herb'] = np.nan
-            if carnivores:
-                stats[f'mean_{trait}_carni'] = np.mean([getattr(o, trait, np.nan) for o in carnivores])
-            else:
-                stats[f'mean_{trait}_carni'] = np.nan
-        return stats
+        if self.population is None and self.running.total() != len(self.organisms):
+            # the organism list was replaced behind our back; start the aggregates over
+            self.running.rebuild(self.organisms)
+        return self.running.snapshot(frame)
 
     def animate(self, fig, ax):
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
         ax.set_xticks(np.arange(0, self.size, 1), minor=True)
         ax.set_yticks(np.arange(0, self.size, 1), minor=True)
         ax.grid(which="minor", color="gray", linestyle="-", linewidth=0.1)
@@ -193,6 +250,9 @@ class Grid:
         plt.show()
 
     def animate_population(self, total_frames):
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
         fig, ax = plt.subplots(figsize=(8,4))
         ax.set_xlim(0, total_frames)
         ax.set_ylim(0, max(self.num_food, 20))
@@ -223,3 +283,73 @@ class Grid:
             fig, update, frames=total_frames, blit=True, interval=100, repeat=False
         )
         plt.show()
+
+
+def step_population(grids, pop, occupied, label, rng, mutation_rng, frame):
+    """One frame of the array engine for every replicate of `pop`, replicate r living on grids[r].
+
+    Grid.step is the one-replicate case and BatchGrid.step the batched one.
+    `occupied` and `label` are the (replicates, size, size) food bitmaps and
+    nearest-food labels; `rng` and `mutation_rng` are ReplicateRandoms over
+    the grids' movement and mutation streams.
+    """
+    size = pop.grid_size
+    for grid in grids:
+        grid.trigger_food_event()
+
+    pop.move(label, rng, frame)
+
+    rep = pop.rep
+    carn = pop.carnivore
+    dead = pop.age >= pop.lifespan
+    alive_herb = np.flatnonzero(~carn & ~dead)
+    alive_carn = np.flatnonzero(carn & ~dead)
+    cells = (rep * size + pop.x) * size + pop.y
+
+    # --- feeding: the first herbivore on a food cell eats it ---
+    on_food = alive_herb[occupied[rep[alive_herb], pop.x[alive_herb], pop.y[alive_herb]]]
+    _, first = np.unique(cells[on_food], return_index=True)
+    feeders = on_food[first]
+    for r, x, y in zip(rep[feeders].tolist(), pop.x[feeders].tolist(), pop.y[feeders].tolist()):
+        grid = grids[r]
+        grid.food_positions.eat((x, y))
+        grid.food_respawn_timer.schedule((x, y), frame)
+    pop.food_touch[feeders] = frame
+
+    touched = pop.food_touch[alive_herb]
+    herb_parents = alive_herb[(touched >= 0) & (frame - touched >= 5)]
+    pop.food_touch[herb_parents] = NO_FRAME
+
+    # --- predation: carnivores and herbivores sharing a cell are paired up in order ---
+    eaten = np.zeros(len(pop), dtype=bool)
+    eaters = np.zeros(0, dtype=np.int64)
+    if len(alive_carn) and len(alive_herb):
+        prey = alive_herb[np.argsort(cells[alive_herb], kind="stable")]
+        prey_cells = cells[prey]
+        hunters = alive_carn[np.argsort(cells[alive_carn], kind="stable")]
+        hunter_cells = cells[hunters]
+        first = np.searchsorted(hunter_cells, hunter_cells, side="left")
+        rank = np.arange(len(hunters)) - first
+        lo = np.searchsorted(prey_cells, hunter_cells, side="left")
+        hi = np.searchsorted(prey_cells, hunter_cells, side="right")
+        fed = rank < hi - lo
+        eaters = hunters[fed]
+        eaten[prey[lo[fed] + rank[fed]]] = True
+        pop.last_meal[eaters] = frame
+        pop.rest_timer[eaters] = 10
+    division = np.array([grid.carnivore_division_probab for grid in grids])
+    roll = mutation_rng.bind(rep[eaters]).random(len(eaters))
+    carn_parents = eaters[roll < division[rep[eaters]]]
+
+    starvation = np.array([grid.carnivore_starvation_time for grid in grids])
+    starved = carn & ~dead & (pop.last_meal >= 0) & (frame - pop.last_meal >= starvation[rep])
+
+    parents = np.concatenate([herb_parents, carn_parents])
+    children = pop.offspring(parents, mutation_rng)
+    children.last_meal[children.carnivore] = frame
+
+    pop.compact(~(dead | eaten | starved))
+    pop.extend(children)
+
+    for grid in grids:
+        grid.respawn_food(frame)
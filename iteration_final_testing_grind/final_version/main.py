@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from grid import Grid
 from organism import Organism
+from runner import Runner, ScatterView
 
 
 # Parameters
@@ -48,9 +49,10 @@ ax_pop.legend()
 herb_counts = np.full(total_frames, np.nan)
 carni_counts = np.full(total_frames, np.nan)
 
+runner = Runner(g, observers=[ScatterView(herbivore_scatter, carnivore_scatter, food_scatter)])
+
 def update(frame):
-    g.update(frame, herbivore_scatter, carnivore_scatter, food_scatter)
-    stats = g.get_stats(frame)
+    stats = runner.step()
     herb_counts[frame] = stats['herbivores']
     carni_counts[frame] = stats['carnivores']
 
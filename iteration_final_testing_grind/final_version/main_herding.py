@@ -4,6 +4,7 @@ import matplotlib.animation as animation
 import networkx as nx
 from grid import Grid
 from organism import Organism
+from runner import Runner, ScatterView
 
 def euclidean(p1, p2):
     return np.linalg.norm(np.array(p1) - np.array(p2))
@@ -61,9 +62,11 @@ ax_herd.set_ylim(0, grid_size)
 bubble_artists = []
 text_artists = []
 
+runner = Runner(g, observers=[ScatterView(herbivore_scatter, carnivore_scatter, food_scatter)])
+
 def update(frame):
     # Update grid (lattice)
-    g.update(frame, herbivore_scatter, carnivore_scatter, food_scatter)
+    runner.step()
 
     # Remove old bubbles and texts
     global bubble_artists, text_artists
@@ -0,0 +1,131 @@
+import numpy as np
+
+EMPTY = -1
+NEVER = np.iinfo(np.int64).max
+# spatial_memory_capacity is int(2 + 6 * memory allocation), so never more than 8
+SLOTS = 8
+FORGET_BELOW = 0.05
+
+
+def memory_strength(t, timestamp, memory):
+    """Strength at frame t of an entry confirmed at `timestamp`, for a given memory trait.
+
+    The closed form decay_spatial_memory used to apply to every entry every
+    frame; works on scalars and arrays alike.
+    """
+    dt = t - timestamp
+    dt = np.maximum(1, dt) if isinstance(dt, np.ndarray) else max(1, dt)
+    return 1.0 / (dt + 1) ** (0.5 + 0.3 * (1 - memory))
+
+
+def expiry_frame(timestamp, memory):
+    """First frame at which an entry's strength is FORGET_BELOW or less, i.e. it is forgotten."""
+    alpha = 0.5 + 0.3 * (1 - np.asarray(memory, dtype=float))
+    # smallest dt >= 1 with (dt + 1) ** alpha >= 1 / FORGET_BELOW, nudged past float rounding
+    dt = np.maximum(1, np.ceil((1 / FORGET_BELOW) ** (1 / alpha)).astype(np.int64) - 1)
+    dt = np.where(1.0 / (dt + 1) ** alpha > FORGET_BELOW, dt + 1, dt)
+    dt = np.where((dt > 1) & (1.0 / dt ** alpha <= FORGET_BELOW), dt - 1, dt)
+    return timestamp + dt
+
+
+class SpatialMemory:
+    """Remembered food cells of a whole population as fixed-width (N, SLOTS) arrays.
+
+    Row i belongs to population row i and slot j holds one entry of what
+    Organism.spatial_memory keeps as a dict: the cell (x, y), the frame it was
+    last confirmed, the frame it will be forgotten and the context it was
+    stored in (fear rounded to one decimal, carnivores seen). A slot is free
+    when x is EMPTY. Strengths are never stored; memory_strength() evaluates
+    them only for the rows that evict, and expire() does nothing
+    until the earliest expiry frame comes round.
+    """
+
+    FIELDS = (
+        ("x", np.int64),
+        ("y", np.int64),
+        ("timestamp", np.int64),
+        ("expires", np.int64),
+        ("fear", np.float64),
+        ("seen", np.int64),
+    )
+
+    def __init__(self, n=0):
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.full((n, SLOTS), EMPTY if name == "x" else 0, dtype=dtype))
+        self.next_expiry = NEVER
+
+    def __len__(self):
+        return len(self.x)
+
+    @classmethod
+    def from_organisms(cls, organisms):
+        block = cls(len(organisms))
+        for i, org in enumerate(organisms):
+            for j, mem in enumerate((org.spatial_memory or [])[:SLOTS]):
+                block.x[i, j], block.y[i, j] = mem["pos"]
+                block.timestamp[i, j] = mem["timestamp"]
+                block.expires[i, j] = mem["expires"]
+                block.fear[i, j] = mem["context"]["fear"]
+                block.seen[i, j] = mem["context"]["carnivores_seen"]
+        block._update_next_expiry()
+        return block
+
+    def take(self, rows):
+        """Copy of the given rows, e.g. the memories children inherit from their parents."""
+        block = SpatialMemory()
+        for name, _ in self.FIELDS:
+            setattr(block, name, getattr(self, name)[rows])
+        block._update_next_expiry()
+        return block
+
+    def compact(self, keep):
+        # dropping rows can only postpone the earliest expiry, so next_expiry stays a safe bound
+        for name, _ in self.FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def extend(self, other):
+        for name, _ in self.FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+        self.next_expiry = min(self.next_expiry, other.next_expiry)
+
+    def _update_next_expiry(self):
+        valid = self.x != EMPTY
+        self.next_expiry = int(self.expires[valid].min()) if valid.any() else NEVER
+
+    def retime(self, memory):
+        """Recompute expiry frames for a new memory trait per row, e.g. after inheritance."""
+        self.expires = expiry_frame(self.timestamp, memory[:, None])
+        self._update_next_expiry()
+
+    def strength(self, rows, t, memory):
+        return memory_strength(t, self.timestamp[rows], memory[:, None])
+
+    def expire(self, t):
+        """Forget the entries whose expiry frame has come; free until the earliest one is due."""
+        if t < self.next_expiry:
+            return
+        self.x[(self.x != EMPTY) & (self.expires <= t)] = EMPTY
+        self._update_next_expiry()
+
+    def record(self, rows, px, py, t, fear, seen, capacity, memory):
+        """Remember cell (px, py) for each row, refreshing it if already known.
+
+        A row holding `capacity` or more entries first forgets its weakest one
+        and the new entry takes that slot; otherwise the first free slot is used.
+        """
+        x, y = self.x[rows], self.y[rows]
+        valid = x != EMPTY
+        match = valid & (x == px[:, None]) & (y == py[:, None])
+        hit = match.any(axis=1)
+        full = ~hit & (valid.sum(axis=1) >= capacity)
+        weakest = np.argmin(np.where(valid, self.strength(rows, t, memory), np.inf), axis=1)
+        slot = np.where(hit, np.argmax(match, axis=1), np.where(full, weakest, np.argmax(~valid, axis=1)))
+        self.x[rows, slot] = px
+        self.y[rows, slot] = py
+        self.timestamp[rows, slot] = t
+        expires = expiry_frame(t, memory)
+        self.expires[rows, slot] = expires
+        if len(rows):
+            self.next_expiry = min(self.next_expiry, int(expires.min()))
+        self.fear[rows, slot] = np.round(fear, 1)
+        self.seen[rows, slot] = seen
@@ -1,148 +1,240 @@
-import random
+import math
 import numpy as np
+from rng import RandomBlock, make_streams
+from memory import memory_strength, expiry_frame, NEVER
+from traits import (sample_allocations, mutate_allocations, express_columns, TRAIT_LAYOUTS,
+                    HERBIVORE_MAPPING, CARNIVORE_MAPPING)
 
-def softmax(x):
-    e_x = np.exp(x - np.max(x))
-    return e_x / e_x.sum()
+NO_CARNIVORES = frozenset()
 
-def convex_tradeoff(x, y, budget=1.0):
-    return (x**0.7 + y**0.7) <= budget**0.7
+# mean allocations used to sample generation >= 5 organisms from scratch
+HERBIVORE_PRIOR = np.array([0.2, 0.2, 0.2, 0.2, 0.1, 0.1])
+CARNIVORE_PRIOR = np.array([0.25, 0.25, 0.25, 0.1, 0.15])
+
+
+class HerbivoreState:
+    __slots__ = ("carnivore_detection", "known_carnivore_ids", "carnivore_sense",
+                 "spatial_memory_capacity", "spatial_memory", "spatial_memory_span",
+                 "spatial_memory_expiry")
+
+    def __init__(self):
+        self.carnivore_detection = 0.0
+        # lineage roots of the carnivores this herbivore knows; immutable so offspring can share it
+        self.known_carnivore_ids = NO_CARNIVORES
+        self.carnivore_sense = 0.0
+        self.spatial_memory_capacity = 0
+        self.spatial_memory = []
+        self.spatial_memory_span = None  # frames an entry lasts; fixed by the memory trait
+        self.spatial_memory_expiry = NEVER  # no entry is forgotten before this frame
+
+
+class CarnivoreState:
+    __slots__ = ("stealth", "hunting_strategy")
+
+    def __init__(self):
+        self.stealth = 0.0
+        self.hunting_strategy = None
+
+
+def _delegate(state, name, default=None):
+    def get(self):
+        s = getattr(self, state)
+        return default if s is None else getattr(s, name)
+
+    def set(self, value):
+        setattr(getattr(self, state), name, value)
+    return property(get, set)
 
-def concave_tradeoff(x, y, budget=1.0):
-    return (x**1.3 + y**1.3) <= budget**1.3
 
 class Organism:
+    """One herbivore or carnivore.
+
+    Trait allocations live in a fixed-order float array (`alloc`, laid out as
+    HERBIVORE_TRAITS or CARNIVORE_TRAITS). Fields only one species uses sit in
+    a HerbivoreState or CarnivoreState, so with __slots__ an organism carries
+    no per-instance dict.
+    """
+    __slots__ = ("id", "x", "y", "grid_size", "cannibalism", "rest_timer", "generation",
+                 "lineage_root", "alloc", "lifespan", "speed", "food_gene", "energy_efficiency",
+                 "memory", "fear", "frames_since_last_food", "age", "herbivore_state", "carnivore_state")
+
     _id_counter = 0
+    rng = RandomBlock()  # movement and sensing draws
+    mutation_rng = RandomBlock()  # trait sampling, inheritance and mutation draws
+
+    memory_decay_base = 150
+    visibility_radius = 5
+    communication_radius = 7
+
+    carnivore_detection = _delegate("herbivore_state", "carnivore_detection")
+    known_carnivore_ids = _delegate("herbivore_state", "known_carnivore_ids")
+    carnivore_sense = _delegate("herbivore_state", "carnivore_sense", 0.0)
+    spatial_memory_capacity = _delegate("herbivore_state", "spatial_memory_capacity", 0)
+    spatial_memory = _delegate("herbivore_state", "spatial_memory")
+    spatial_memory_span = _delegate("herbivore_state", "spatial_memory_span")
+    spatial_memory_expiry = _delegate("herbivore_state", "spatial_memory_expiry", NEVER)
+    stealth = _delegate("carnivore_state", "stealth")
+    hunting_strategy = _delegate("carnivore_state", "hunting_strategy")
+
+    @classmethod
+    def reset(cls, seed=None):
+        """Start a fresh run: restart ids and reseed the shared streams.
 
-    def __init__(self, x, y, grid_size, cannibalism=False, lineage=None, generation=0):
+        Call before creating the run's organisms so that ids, trait draws and
+        movement all follow from `seed` alone.
+        """
+        streams = make_streams(seed)
+        cls._id_counter = 0
+        cls.rng = RandomBlock(streams["movement"])
+        cls.mutation_rng = RandomBlock(streams["mutation"])
+
+    def __init__(self, x, y, grid_size, cannibalism=False, lineage_root=None, generation=0):
         self.x = x
         self.y = y
         self.grid_size = grid_size
         self.cannibalism = cannibalism
         self.rest_timer = 0
         self.generation = generation
+        self.herbivore_state = None
+        self.carnivore_state = None
 
         self.id = Organism._id_counter
         Organism._id_counter += 1
         if cannibalism:
-            if lineage is None:
-                self.lineage = set([self.id])
-            else:
-                self.lineage = set(lineage)
-                self.lineage.add(self.id)
+            # a carnivore founds a lineage unless it is given one to join
+            self.lineage_root = self.id if lineage_root is None else lineage_root
         else:
-            self.lineage = None
+            self.lineage_root = None
 
         # --- Early generations: all traits start low and similar, then improve ---
         if generation < 5:
             base = 0.13 + 0.04 * generation
-            if not cannibalism:
-                self.traits = {
-                    "lifespan": base,
-                    "speed": base,
-                    "food_gene": base,
-                    "carnivore_detection": base,
-                    "memory": base,
-                    "energy_efficiency": base,
-                }
-            else:
-                self.traits = {
-                    "lifespan": base,
-                    "speed": base,
-                    "stealth": base,
-                    "energy_efficiency": base,
-                    "food_gene": base,  # Ensure carnivores have food_gene from the start
-                }
+            # carnivores carry food_gene from the start too
+            self.alloc = np.full(5 if cannibalism else 6, base)
         else:
-            if not cannibalism:
-                raw = np.abs(np.random.normal([0.2, 0.2, 0.2, 0.2, 0.1, 0.1], 0.07, 6))
-                alloc = softmax(raw)
-                while not convex_tradeoff(alloc[0], alloc[1]):
-                    raw = np.abs(np.random.normal([0.2, 0.2, 0.2, 0.2, 0.1, 0.1], 0.07, 6))
-                    alloc = softmax(raw)
-                self.traits = {
-                    "lifespan": alloc[0],
-                    "speed": alloc[1],
-                    "food_gene": alloc[2],
-                    "carnivore_detection": alloc[3],
-                    "memory": alloc[4],
-                    "energy_efficiency": alloc[5],
-                }
-            else:
-                raw = np.abs(np.random.normal([0.25, 0.25, 0.25, 0.1, 0.15], 0.07, 5))
-                alloc = softmax(raw)
-                while not concave_tradeoff(alloc[1], alloc[2]):
-                    raw = np.abs(np.random.normal([0.25, 0.25, 0.25, 0.1, 0.15], 0.07, 5))
-                    alloc = softmax(raw)
-                self.traits = {
-                    "lifespan": alloc[0],
-                    "speed": alloc[1],
-                    "stealth": alloc[2],
-                    "energy_efficiency": alloc[3],
-                    "food_gene": alloc[4],  # Carnivores now evolve food_gene too
-                }
+            prior = CARNIVORE_PRIOR if cannibalism else HERBIVORE_PRIOR
+            self.alloc = sample_allocations(prior, 1, Organism.mutation_rng)[0].copy()
 
         # --- Map trait allocations to actual values ---
         if not cannibalism:
-            self.lifespan = int(500 + 1500 * self.traits["lifespan"])
-            self.speed = 0.05 + 0.85 * self.traits["speed"]
-            self.food_gene = 0.05 + 0.45 * self.traits["food_gene"]
-            self.carnivore_detection = 2 + 12 * self.traits["carnivore_detection"]
-            self.memory = 0.05 + 0.9 * self.traits["memory"]
-            self.energy_efficiency = 0.5 + 0.5 * self.traits["energy_efficiency"]
+            self.herbivore_state = HerbivoreState()
+            self.express_traits(HERBIVORE_MAPPING)
             self.fear = 0.2
-            self.known_carnivore_ids = set()
-            self.carnivore_sense = np.clip(np.random.normal(0.8, 0.2), 0, 1)
-            self.spatial_memory_capacity = int(2 + 6 * self.traits["memory"])
-            self.spatial_memory = []
+            self.carnivore_sense = min(1.0, max(0.0, Organism.mutation_rng.normal(0.8, 0.2)))
+            self.spatial_memory_capacity = int(2 + 6 * self.alloc[4])
         else:
-            self.lifespan = int(600 + 1200 * self.traits["lifespan"])
-            self.speed = 0.1 + 0.8 * self.traits["speed"]
-            self.stealth = 0.05 + 0.9 * self.traits["stealth"]
-            self.energy_efficiency = 0.5 + 0.5 * self.traits["energy_efficiency"]
-            self.food_gene = 0.05 + 0.45 * self.traits["food_gene"]  # Now evolves for carnivores
-            self.hunting_strategy = random.choices(
+            self.carnivore_state = CarnivoreState()
+            self.express_traits(CARNIVORE_MAPPING)
+            self.hunting_strategy = Organism.mutation_rng.weighted_choice(
                 ["ambush", "pursuit"],
                 weights=[self.stealth, self.speed]
-            )[0]
+            )
             self.memory = 0.0
             self.fear = 0.0
-            self.known_carnivore_ids = None
-            self.carnivore_sense = 0.0
 
-        self.memory_decay_base = 150
-        self.visibility_radius = 5
-        self.communication_radius = 7
         self.frames_since_last_food = 0
         self.age = 0
 
+    @classmethod
+    def from_parent(cls, parent, alloc, expressed=None):
+        """Child of `parent` with allocation `alloc`, of the parent's species.
+
+        Skips __init__'s trait sampling, sense and strategy draws, which division
+        would overwrite anyway; the caller fills in the inherited fields.
+        `expressed`, if given, holds the already mapped (trait, value) pairs.
+        """
+        child = cls.__new__(cls)
+        child.x = parent.x
+        child.y = parent.y
+        child.grid_size = parent.grid_size
+        child.cannibalism = parent.cannibalism
+        child.rest_timer = 0
+        child.generation = parent.generation + 1
+        child.id = cls._id_counter
+        cls._id_counter += 1
+        child.alloc = alloc
+        child.frames_since_last_food = 0
+        child.age = 0
+        if parent.cannibalism:
+            # a mutant parent has no lineage, so its children each found their own
+            child.lineage_root = child.id if parent.lineage_root is None else parent.lineage_root
+            child.herbivore_state = None
+            child.carnivore_state = CarnivoreState()
+            child.memory = 0.0
+            child.fear = 0.0
+        else:
+            child.lineage_root = None
+            child.herbivore_state = HerbivoreState()
+            child.carnivore_state = None
+            child.fear = 0.2
+        if expressed is None:
+            child.express_traits(CARNIVORE_MAPPING if parent.cannibalism else HERBIVORE_MAPPING)
+        else:
+            for trait, value in expressed:
+                setattr(child, trait, value)
+        return child
+
+    @property
+    def traits(self):
+        return dict(zip(TRAIT_LAYOUTS[len(self.alloc)], self.alloc))
+
+    def express_traits(self, mapping):
+        """Set trait values from the allocation through a linear (offset, scale) mapping."""
+        for trait, a in zip(TRAIT_LAYOUTS[len(self.alloc)], self.alloc):
+            if trait in mapping:
+                offset, scale = mapping[trait]
+                value = offset + scale * a
+                setattr(self, trait, int(value) if trait == "lifespan" else float(value))
+
     def current_context(self):
         return {
             "fear": round(self.fear, 1),
             "carnivores_seen": len(self.known_carnivore_ids) if self.known_carnivore_ids is not None else 0,
         }
 
+    def memory_span(self):
+        """Frames a spatial memory entry survives before its strength falls to 0.05."""
+        span = self.spatial_memory_span
+        if span is None:
+            span = self.spatial_memory_span = int(expiry_frame(0, self.memory))
+        return span
+
     def update_spatial_memory(self, food_pos, t):
         context = self.current_context()
+        expires = t + self.memory_span()
         for mem in self.spatial_memory:
             if mem["pos"] == food_pos:
-                mem["strength"] = 1.0
                 mem["timestamp"] = t
+                mem["expires"] = expires
                 mem["context"] = context
                 return
         if len(self.spatial_memory) >= self.spatial_memory_capacity:
-            weakest = min(self.spatial_memory, key=lambda m: m["strength"])
+            # every entry decays at this organism's rate, so the weakest is the oldest
+            weakest = min(self.spatial_memory, key=lambda m: m["timestamp"])
             self.spatial_memory.remove(weakest)
-        self.spatial_memory.append({"pos": food_pos, "strength": 1.0, "context": context, "timestamp": t})
+        self.spatial_memory.append({"pos": food_pos, "context": context, "timestamp": t, "expires": expires})
+        self.spatial_memory_expiry = min(self.spatial_memory_expiry, expires)
+
+    def inherit_spatial_memory(self, memories):
+        self.spatial_memory = [dict(m) for m in memories]
+        self.retime_spatial_memory()
+
+    def retime_spatial_memory(self):
+        """Recompute expiry frames after the memory trait changed, e.g. after inheritance or fear transfer."""
+        self.spatial_memory_span = None
+        span = self.memory_span()
+        for m in self.spatial_memory:
+            m["expires"] = m["timestamp"] + span
+        self.spatial_memory_expiry = min((m["expires"] for m in self.spatial_memory), default=NEVER)
 
     def decay_spatial_memory(self, t):
-        for mem in self.spatial_memory:
-            dt = max(1, t - mem["timestamp"])
-            alpha = 0.5 + 0.3 * (1 - self.memory)
-            mem["strength"] = max(0.0, 1.0 / ((dt + 1) ** alpha))
-        self.spatial_memory = [m for m in self.spatial_memory if m["strength"] > 0.05]
+        # strengths are evaluated on demand; only expired entries have to go
+        if t < self.spatial_memory_expiry:
+            return
+        self.spatial_memory = [m for m in self.spatial_memory if m["expires"] > t]
+        self.spatial_memory_expiry = min((m["expires"] for m in self.spatial_memory), default=NEVER)
 
-    def retrieve_spatial_memory(self):
+    def retrieve_spatial_memory(self, t=0):
         if not self.spatial_memory:
             return None
         current = self.current_context()
@@ -153,34 +245,37 @@ class Organism:
         scored = []
         for mem in self.spatial_memory:
             sim = context_similarity(mem["context"], current)
-            score = sim * mem["strength"]
+            score = sim * memory_strength(t, mem["timestamp"], self.memory)
             scored.append((score, mem["pos"]))
         if not scored:
             return None
         scored.sort(reverse=True)
         top_score, top_pos = scored[0]
-        if random.random() < top_score:
+        if self.rng.random() < top_score:
             return top_pos
         return None
 
     def gene_food(self, food_positions):
         return self.food_gene if food_positions else 0.0
 
-    def detect_and_flee(self, other_organisms):
+    def detect_and_flee(self, other_organisms, index=None):
         if self.cannibalism:
             return False
         nearest_threat = None
         min_distance = float('inf')
         effective_detection = self.carnivore_detection * (1 + 0.5 * self.fear)
+        if index is not None:
+            nearest_threat, min_distance = self._nearest_recognised(index, effective_detection)
+            other_organisms = ()
         for org in other_organisms:
             if not org.cannibalism:
                 continue
             known = False
-            if hasattr(org, 'lineage') and org.lineage is not None and self.known_carnivore_ids and self.known_carnivore_ids.intersection(org.lineage):
+            if org.lineage_root is not None and org.lineage_root in self.known_carnivore_ids:
                 known = True
-            elif self.carnivore_sense > 0 and random.random() < self.carnivore_sense:
-                if hasattr(org, 'lineage') and org.lineage is not None:
-                    self.known_carnivore_ids.update(org.lineage)
+            elif self.carnivore_sense > 0 and self.rng.random() < self.carnivore_sense:
+                if org.lineage_root is not None:
+                    self.known_carnivore_ids |= {org.lineage_root}
                 known = True
             if known:
                 dist = abs(org.x - self.x) + abs(org.y - self.y)
@@ -188,11 +283,11 @@ class Organism:
                     nearest_threat = org
                     min_distance = dist
         if nearest_threat:
-            fear_increase = 0.8 / (1 + np.exp(-0.5 * (min_distance - 3)))
+            fear_increase = 0.8 / (1 + math.exp(-0.5 * (min_distance - 3)))
             self.fear = min(1.0, self.fear + fear_increase)
             self.energy_efficiency = max(0.5, self.energy_efficiency - 0.1 * fear_increase)
             effective_speed = self.speed * (1 + 2.5 * (self.fear ** 0.7))
-            if random.random() < effective_speed:
+            if self.rng.random() < effective_speed:
                 dx = -np.sign(nearest_threat.x - self.x)
                 dy = -np.sign(nearest_threat.y - self.y)
                 self.x = max(0, min(self.grid_size - 1, self.x + dx))
@@ -200,40 +295,88 @@ class Organism:
             return True
         return False
 
+    def _nearest_recognised(self, index, radius):
+        """detect_and_flee's scan over every carnivore, with the index doing the distance work.
+
+        Only carnivores within `radius` can be the threat, but every carnivore
+        on the lattice still gets its sense roll, since a success teaches its
+        lineage. Out-of-range carnivores matter only through that, so each run
+        of k of them between two in-range members of an unknown lineage (in
+        list order) is one draw succeeding with chance 1 - (1 - sense) ** k,
+        the chance that one of k rolls succeeds.
+        """
+        sense = self.carnivore_sense
+        nearest_threat, min_distance = None, float('inf')
+        rolled = {}  # lineage root -> members (in list order) whose rolls are accounted for
+
+        def learned(root, k):
+            if k > 0 and sense > 0 and self.rng.random() < 1 - (1 - sense) ** k:
+                self.known_carnivore_ids |= {root}
+                return True
+            return False
+
+        for org in index.within(self.x, self.y, radius, carnivore=True):
+            root = org.lineage_root
+            recognised = root is not None and root in self.known_carnivore_ids
+            if not recognised and root is not None:
+                # members of its lineage listed before it, out of range, roll first
+                rank = index.lineage_rank[org]
+                recognised = learned(root, rank - rolled.get(root, 0))
+                rolled[root] = rank + 1
+            if not recognised and sense > 0 and self.rng.random() < sense:
+                if root is not None:
+                    self.known_carnivore_ids |= {root}
+                recognised = True
+            if recognised:
+                dist = abs(org.x - self.x) + abs(org.y - self.y)
+                if dist < min_distance:
+                    nearest_threat, min_distance = org, dist
+        # the rest of every lineage still unknown rolls too
+        for root in index.lineage_roots - self.known_carnivore_ids:
+            learned(root, index.lineage_size[root] - rolled.get(root, 0))
+        return nearest_threat, min_distance
+
     def move_towards_food(self, food_positions, t):
-        mem_target = self.retrieve_spatial_memory()
+        mem_target = self.retrieve_spatial_memory(t)
         if not food_positions and mem_target:
             target_food = mem_target
         elif food_positions:
-            target_food = min(food_positions, key=lambda f: abs(f[0] - self.x) + abs(f[1] - self.y))
+            target_food = food_positions.nearest(self.x, self.y)
             self.update_spatial_memory(target_food, t)
         else:
             self.move_random()
             return
         dx = np.sign(target_food[0] - self.x)
         dy = np.sign(target_food[1] - self.y)
-        if random.random() < self.food_gene:
-            move_direction = random.choice([(dx, 0), (0, dy)]) if dx and dy else (dx, dy)
+        if self.rng.random() < self.food_gene:
+            move_direction = self.rng.choice([(dx, 0), (0, dy)]) if dx and dy else (dx, dy)
             self.x = max(0, min(self.grid_size - 1, self.x + move_direction[0]))
             self.y = max(0, min(self.grid_size - 1, self.y + move_direction[1]))
         else:
             self.move_random()
 
-    def move_towards_prey(self, other_organisms):
-        herbivores = [o for o in other_organisms if not o.cannibalism]
-        if not herbivores or random.random() > self.food_gene:
+    def move_towards_prey(self, other_organisms, index=None):
+        if index is not None:
+            has_prey = index.count(carnivore=False) > 0
+        else:
+            herbivores = [o for o in other_organisms if not o.cannibalism]
+            has_prey = bool(herbivores)
+        if not has_prey or self.rng.random() > self.food_gene:
             self.move_random()
             return
-        nearest_prey = min(herbivores, key=lambda o: abs(o.x - self.x) + abs(o.y - self.y))
+        if index is not None:
+            nearest_prey = index.nearest(self.x, self.y, carnivore=False)
+        else:
+            nearest_prey = min(herbivores, key=lambda o: abs(o.x - self.x) + abs(o.y - self.y))
         dx = np.sign(nearest_prey.x - self.x)
         dy = np.sign(nearest_prey.y - self.y)
-        move_direction = random.choice([(dx, 0), (0, dy)]) if dx and dy else (dx, dy)
+        move_direction = self.rng.choice([(dx, 0), (0, dy)]) if dx and dy else (dx, dy)
         self.x = max(0, min(self.grid_size - 1, self.x + move_direction[0]))
         self.y = max(0, min(self.grid_size - 1, self.y + move_direction[1]))
 
     def move_random(self):
-        direction = random.choice(["up", "down", "left", "right"])
-        if random.random() < self.speed:
+        direction = self.rng.choice(["up", "down", "left", "right"])
+        if self.rng.random() < self.speed:
             if direction == "up" and self.y < self.grid_size - 1:
                 self.y += 1
             elif direction == "down" and self.y > 0:
@@ -243,11 +386,9 @@ class Organism:
             elif direction == "right" and self.x < self.grid_size - 1:
                 self.x += 1
 
-    def move(self, food_positions, other_organisms, movement_cost=1.0, t=0):
+    def move(self, food_positions, other_organisms, movement_cost=1.0, t=0, index=None):
         self.age += movement_cost * (1 + self.fear)
         self.frames_since_last_food += 1
-        if not self.cannibalism:
-            self.communicate_carnivore(other_organisms)
         if self.cannibalism and self.rest_timer > 0:
             self.rest_timer -= 1
             return
@@ -255,8 +396,8 @@ class Organism:
             self.decay_spatial_memory(t)
         self.fear = max(0.0, self.fear - 0.05)
         if self.cannibalism:
-            self.move_towards_prey(other_organisms)
-        elif not self.detect_and_flee(other_organisms):
+            self.move_towards_prey(other_organisms, index)
+        elif not self.detect_and_flee(other_organisms, index):
             self.food_gene = self.gene_food(food_positions)
             if self.food_gene > 0.0:
                 self.move_towards_food(food_positions, t)
@@ -267,79 +408,126 @@ class Organism:
         return self.age >= self.lifespan
 
     def division(self, carnivores_exist=False):
+        alloc = mutate_allocations(self.alloc[None], self.mutation_rng)[0].copy()
+        offspring = Organism.from_parent(self, alloc)
         if self.cannibalism:
-            offspring = Organism(self.x, self.y, self.grid_size, cannibalism=True, lineage=self.lineage, generation=self.generation+1)
-            keys = list(self.traits.keys())
-            alloc = np.array([self.traits[k] for k in keys])
-            alloc += np.random.normal(0, 0.04, len(alloc))
-            alloc = np.clip(alloc, 0.01, None)
-            alloc = softmax(alloc)
-            while not concave_tradeoff(alloc[1], alloc[2]):
-                alloc = np.abs(alloc + np.random.normal(0, 0.03, len(alloc)))
-                alloc = softmax(alloc)
-            for i, k in enumerate(keys):
-                offspring.traits[k] = alloc[i]
-            offspring.lifespan = int(600 + 1200 * offspring.traits["lifespan"])
-            offspring.speed = 0.1 + 0.8 * offspring.traits["speed"]
-            offspring.stealth = 0.05 + 0.9 * offspring.traits["stealth"]
-            offspring.energy_efficiency = 0.5 + 0.5 * offspring.traits["energy_efficiency"]
-            offspring.food_gene = 0.05 + 0.45 * offspring.traits["food_gene"]  # Now evolves for carnivores
-            offspring.hunting_strategy = random.choices(
+            offspring.hunting_strategy = Organism.mutation_rng.weighted_choice(
                 ["ambush", "pursuit"],
                 weights=[offspring.stealth, offspring.speed]
-            )[0]
+            )
         else:
-            offspring = Organism(self.x, self.y, self.grid_size, cannibalism=False, generation=self.generation+1)
-            keys = list(self.traits.keys())
-            alloc = np.array([self.traits[k] for k in keys])
-            alloc += np.random.normal(0, 0.04, len(alloc))
-            alloc = np.clip(alloc, 0.01, None)
-            alloc = softmax(alloc)
-            while not convex_tradeoff(alloc[0], alloc[1]):
-                alloc = np.abs(alloc + np.random.normal(0, 0.03, len(alloc)))
-                alloc = softmax(alloc)
-            for i, k in enumerate(keys):
-                offspring.traits[k] = alloc[i]
-            offspring.lifespan = int(500 + 1500 * offspring.traits["lifespan"])
-            offspring.speed = 0.05 + 0.85 * offspring.traits["speed"]
-            offspring.food_gene = 0.05 + 0.45 * offspring.traits["food_gene"]
-            offspring.carnivore_detection = 2 + 12 * offspring.traits["carnivore_detection"]
-            offspring.memory = 0.05 + 0.9 * offspring.traits["memory"]
-            offspring.energy_efficiency = 0.5 + 0.5 * offspring.traits["energy_efficiency"]
-            offspring.known_carnivore_ids = set(self.known_carnivore_ids)
-            offspring.carnivore_sense = np.clip(np.random.normal(self.carnivore_sense, 0.05), 0, 1)
-            offspring.spatial_memory_capacity = int(2 + 6 * offspring.traits["memory"])
-            offspring.spatial_memory = [dict(m) for m in self.spatial_memory]
+            offspring.known_carnivore_ids = self.known_carnivore_ids
+            offspring.carnivore_sense = min(1.0, max(0.0, self.mutation_rng.normal(self.carnivore_sense, 0.05)))
+            offspring.spatial_memory_capacity = int(2 + 6 * alloc[4])
+            offspring.inherit_spatial_memory(self.spatial_memory)
             mutation_chance = 0.002 if carnivores_exist else 0.1  # Make carnivore emergence more likely
-            offspring.cannibalism = random.random() < mutation_chance
+            offspring.cannibalism = self.mutation_rng.random() < mutation_chance
         return offspring
 
     def witness_cannibalization(self, carnivore, prey_pos):
         dist = abs(prey_pos[0] - self.x) + abs(prey_pos[1] - self.y)
         if dist <= self.visibility_radius and not self.cannibalism:
-            if hasattr(carnivore, 'lineage') and carnivore.lineage is not None:
-                self.known_carnivore_ids.update(carnivore.lineage)
+            if carnivore.lineage_root is not None:
+                self.known_carnivore_ids |= {carnivore.lineage_root}
             self.fear = min(1.0, self.fear + 0.6)
-            self.communicate_carnivore(None)
             return True
         return False
 
-    def communicate_carnivore(self, other_organisms):
-        if self.cannibalism or not hasattr(self, 'known_carnivore_ids'):
-            return
-        if other_organisms is None:
-            return
-        comm_radius = self.communication_radius * (1 + 0.3 * self.fear)
-        for org in other_organisms:
-            if not org.cannibalism and org != self:
-                dist = abs(org.x - self.x) + abs(org.y - self.y)
-                if dist <= comm_radius:
-                    if hasattr(org, 'known_carnivore_ids') and self.known_carnivore_ids:
-                        before = len(org.known_carnivore_ids)
-                        org.known_carnivore_ids.update(self.known_carnivore_ids)
-                        after = len(org.known_carnivore_ids)
-                        if after > before:
-                            org.communicate_carnivore(other_organisms)
-                        fear_transfer = 0.4 * (1 - dist / comm_radius)
-                        org.fear = min(1.0, org.fear + fear_transfer * (1 - org.fear))
-                        org.memory = min(1.0, org.memory + 0.1 * fear_transfer)
+
+def divide_all(parents, carnivores_exist=False):
+    """Offspring of every parent, in order: the batched counterpart of Organism.division.
+
+    Parents are grouped by allocation layout. Each group's allocation matrix is
+    mutated in one mutate_allocations call and mapped to trait values column by
+    column; the per-child draws (carnivore_sense, hunting strategy, carnivore
+    mutation) come from one block per group too.
+    """
+    rng = Organism.mutation_rng
+    offspring = [None] * len(parents)
+    groups = {}
+    for i, parent in enumerate(parents):
+        groups.setdefault((parent.cannibalism, len(parent.alloc)), []).append(i)
+    for (carnivore, _), rows in groups.items():
+        allocs = mutate_allocations(np.array([parents[i].alloc for i in rows]), rng)
+        columns = express_columns(allocs, CARNIVORE_MAPPING if carnivore else HERBIVORE_MAPPING)
+        children = [Organism.from_parent(parents[i], alloc, [(trait, values[j]) for trait, values in columns])
+                    for j, (i, alloc) in enumerate(zip(rows, allocs))]
+        if carnivore:
+            u = rng.uniform(len(rows))
+            for child, u in zip(children, u.tolist()):
+                # weighted_choice(["ambush", "pursuit"], [stealth, speed]) on a pre-drawn uniform
+                child.hunting_strategy = "ambush" if u * (child.stealth + child.speed) < child.stealth else "pursuit"
+        else:
+            mutation_chance = 0.002 if carnivores_exist else 0.1  # Make carnivore emergence more likely
+            z = rng.normal(0.0, 0.05, len(rows)).tolist()
+            flips = (rng.uniform(len(rows)) < mutation_chance).tolist()
+            capacity = (2 + 6 * allocs[:, 4]).astype(int).tolist()
+            for j, (i, child) in enumerate(zip(rows, children)):
+                parent = parents[i]
+                child.known_carnivore_ids = parent.known_carnivore_ids
+                child.carnivore_sense = min(1.0, max(0.0, parent.carnivore_sense + z[j]))
+                child.spatial_memory_capacity = capacity[j]
+                child.inherit_spatial_memory(parent.spatial_memory)
+                child.cannibalism = flips[j]
+        for i, child in zip(rows, children):
+            offspring[i] = child
+    return offspring
+
+
+def transfer_fear(org, dist, comm_radius):
+    fear_transfer = 0.4 * (1 - dist / comm_radius)
+    org.fear = min(1.0, org.fear + fear_transfer * (1 - org.fear))
+    memory = min(1.0, org.memory + 0.1 * fear_transfer)
+    if memory != org.memory:
+        org.memory = memory
+        org.retime_spatial_memory()
+
+
+def share_carnivore_knowledge(herbivores, index):
+    """Spread carnivore knowledge through the herbivores once per frame.
+
+    Herds are the connected components of the links between herbivores within
+    each other's communication radius, found with union-find over the spatial
+    index. Every member of a herd receives the herd's merged knowledge, then
+    every informed herbivore passes fear to the neighbours inside its own
+    radius, once.
+    """
+    parent = {h: h for h in herbivores}
+    radius = {h: h.communication_radius * (1 + 0.3 * h.fear) for h in herbivores}
+
+    def find(h):
+        while parent[h] is not h:
+            parent[h] = parent[parent[h]]
+            h = parent[h]
+        return h
+
+    links = {}
+    for h in herbivores:
+        comm_radius = radius[h]
+        near = [(o, abs(o.x - h.x) + abs(o.y - h.y))
+                for o in index.within(h.x, h.y, comm_radius, carnivore=False)
+                if o is not h and o in parent]
+        links[h] = (comm_radius, near)
+        for o, dist in near:
+            # knowledge only crosses links both ends can reach, so it flows both ways
+            if dist <= radius[o]:
+                a, b = find(h), find(o)
+                if a is not b:
+                    parent[a] = b
+
+    merged = {}
+    for h in herbivores:
+        if h.known_carnivore_ids:
+            merged.setdefault(find(h), set()).update(h.known_carnivore_ids)
+    if not merged:
+        return
+    for h in herbivores:
+        known = merged.get(find(h))
+        if known and len(h.known_carnivore_ids) < len(known):
+            h.known_carnivore_ids |= known
+
+    for h in herbivores:
+        if h.known_carnivore_ids:
+            comm_radius, near = links[h]
+            for o, dist in near:
+                transfer_fear(o, dist, comm_radius)
@@ -0,0 +1,476 @@
+import numpy as np
+from organism import Organism
+from food import NO_FOOD
+from memory import SpatialMemory
+from spatial import CellIndex
+from traits import mutate_allocations, HERBIVORE_TRAITS, CARNIVORE_TRAITS, HERBIVORE_MAPPING, CARNIVORE_MAPPING
+
+NUM_TRAITS = len(HERBIVORE_TRAITS)
+NO_FRAME = -1
+NO_LINEAGE = -1
+
+# (dx, dy) of the four random-walk directions: up, down, left, right
+DIRECTIONS = np.array([[0, 1], [0, -1], [-1, 0], [1, 0]])
+
+
+def rank_within(rep, replicates):
+    """Position of every element among the elements of its own replicate, in order."""
+    counts = np.bincount(rep, minlength=replicates)
+    start = np.cumsum(counts) - counts
+    if len(rep) < 2 or (rep[1:] >= rep[:-1]).all():
+        return np.arange(len(rep)) - start[rep]
+    order = np.argsort(rep, kind="stable")
+    rank = np.empty(len(rep), dtype=np.int64)
+    rank[order] = np.arange(len(rep)) - start[rep[order]]
+    return rank
+
+
+def components(n, i, j):
+    """Connected component of each of n nodes joined by the edges (i, j), labelled by its smallest node."""
+    label = np.arange(n)
+    while True:
+        new = label.copy()
+        np.minimum.at(new, i, label[j])
+        np.minimum.at(new, j, label[i])
+        new = new[new]
+        if (new == label).all():
+            return label
+        label = new
+
+
+def widen(known, roots, to):
+    """Known-lineage columns for the sorted `roots`, laid out over the sorted superset `to`."""
+    if len(roots) == len(to):
+        return known
+    out = np.zeros((len(known), len(to)), dtype=bool)
+    out[:, np.searchsorted(to, roots)] = known
+    return out
+
+
+class Population:
+    """Structure-of-arrays store for the whole population, advanced by Grid.step.
+
+    Every per-organism attribute lives in one contiguous NumPy column, so a frame
+    is a handful of whole-population array operations instead of one Python
+    method call per organism. A herbivore's known carnivore lineages are a row
+    of the boolean matrix `known`, whose columns are the lineage roots in
+    `known_roots` (sorted, and only those some organism knows). Allocations
+    keep the layout they were born with: `alloc` rows are herbivore-layout
+    where `herbivore_layout` is set (herbivores and the mutant carnivores
+    they give rise to, with their descendants) and carnivore-layout, padded
+    with NaN, otherwise.
+
+    The rows may hold several independent replicates (BatchGrid), grouped by
+    the `rep` column. Organisms only ever meet their own replicate, draw from
+    its streams and take ids from its next_id; lineage roots are qualified as
+    (rep << 32) | founder id. A plain Grid is the one-replicate case.
+    """
+
+    FIELDS = (
+        ("id", np.int64),
+        ("x", np.int64),
+        ("y", np.int64),
+        ("age", np.float64),
+        ("lifespan", np.int64),
+        ("speed", np.float64),
+        ("food_gene", np.float64),
+        ("fear", np.float64),
+        ("carnivore_detection", np.float64),
+        ("energy_efficiency", np.float64),
+        ("memory", np.float64),
+        ("stealth", np.float64),
+        ("carnivore_sense", np.float64),
+        ("carnivores_seen", np.int64),
+        ("carnivore", np.bool_),
+        ("herbivore_layout", np.bool_),
+        ("rest_timer", np.int64),
+        ("generation", np.int64),
+        ("food_touch", np.int64),
+        ("last_meal", np.int64),
+        ("lineage", np.int64),
+        ("rep", np.int64),
+    )
+
+    def __init__(self, grid_size, replicates=1):
+        self.grid_size = grid_size
+        self.replicates = replicates
+        self.next_id = np.zeros(replicates, dtype=np.int64)
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.alloc = np.zeros((0, NUM_TRAITS))
+        self.known = np.zeros((0, 0), dtype=bool)
+        self.known_roots = np.zeros(0, dtype=np.int64)
+        self.food_memory = SpatialMemory()
+        self.stats = None  # RunningStats kept in step with births, deaths and trait changes
+
+    def __len__(self):
+        return len(self.id)
+
+    @classmethod
+    def from_organisms(cls, organisms, grid_size, food_touch_time=None, carnivore_last_meal_time=None):
+        food_touch_time = food_touch_time or {}
+        carnivore_last_meal_time = carnivore_last_meal_time or {}
+        pop = cls(grid_size)
+        n = len(organisms)
+        cols = {name: np.zeros(n, dtype=dtype) for name, dtype in cls.FIELDS}
+        alloc = np.full((n, NUM_TRAITS), np.nan)
+        for i, org in enumerate(organisms):
+            for name, _ in cls.FIELDS:
+                if name in ("carnivore", "herbivore_layout", "carnivores_seen", "food_touch", "last_meal",
+                            "lineage"):
+                    continue
+                cols[name][i] = getattr(org, name, 0) or 0
+            cols["carnivore"][i] = org.cannibalism
+            cols["carnivores_seen"][i] = len(org.known_carnivore_ids or ())
+            cols["food_touch"][i] = food_touch_time.get(org, NO_FRAME)
+            cols["last_meal"][i] = carnivore_last_meal_time.get(org, NO_FRAME)
+            cols["lineage"][i] = NO_LINEAGE if org.lineage_root is None else org.lineage_root
+            cols["herbivore_layout"][i] = len(org.alloc) == NUM_TRAITS
+            alloc[i, :len(org.alloc)] = org.alloc
+        for name, _ in cls.FIELDS:
+            setattr(pop, name, cols[name])
+        pop.alloc = alloc
+        known_ids = [() if org.cannibalism else org.known_carnivore_ids for org in organisms]
+        pop.known_roots = np.array(sorted(set().union(*known_ids)), dtype=np.int64)
+        pop.known = np.zeros((n, len(pop.known_roots)), dtype=bool)
+        for i, ids in enumerate(known_ids):
+            if ids:
+                pop.known[i, np.searchsorted(pop.known_roots, list(ids))] = True
+        pop.food_memory = SpatialMemory.from_organisms(organisms)
+        return pop
+
+    # --- bookkeeping ---
+
+    def _tracked(self, rows=slice(None)):
+        return [getattr(self, trait)[rows] for trait in self.stats.traits]
+
+    def rebuild_stats(self):
+        self.stats.rebuild_rows(self.carnivore, self._tracked())
+
+    def _assign(self, trait, rows, values):
+        # in-place trait change that keeps the running stats current
+        column = getattr(self, trait)
+        if self.stats is not None and trait in self.stats.traits:
+            self.stats.change_rows(self.carnivore[rows], trait, column[rows], values)
+        column[rows] = values
+
+    def compact(self, keep):
+        if self.stats is not None:
+            gone = np.ones(len(self), dtype=bool)
+            gone[keep] = False
+            self.stats.remove_rows(self.carnivore[gone], self._tracked(gone))
+        for name, _ in self.FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.alloc = self.alloc[keep]
+        self.known = self.known[keep]
+        held = self.known.any(axis=0)
+        if not held.all():
+            self.known, self.known_roots = self.known[:, held], self.known_roots[held]
+        self.food_memory.compact(keep)
+
+    def extend(self, other):
+        if self.stats is not None:
+            self.stats.add_rows(other.carnivore, [getattr(other, trait) for trait in self.stats.traits])
+        for name, _ in self.FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+        self.alloc = np.concatenate([self.alloc, other.alloc])
+        roots = np.union1d(self.known_roots, other.known_roots)
+        self.known = np.concatenate([widen(self.known, self.known_roots, roots),
+                                     widen(other.known, other.known_roots, roots)])
+        self.known_roots = roots
+        self.food_memory.extend(other.food_memory)
+        # keep rows grouped by replicate; a stable sort leaves each replicate's own order alone
+        if len(self.rep) > 1 and (self.rep[1:] < self.rep[:-1]).any():
+            self.compact(np.argsort(self.rep, kind="stable"))
+
+    def express(self, rows=slice(None)):
+        """Recompute mapped trait values from the allocation matrix.
+
+        Each row maps the traits of its own layout that its species' mapping
+        has, as Organism.express_traits does; the rest keep their values.
+        """
+        carn = self.carnivore[rows]
+        layout = self.herbivore_layout[rows]
+        alloc = self.alloc[rows]
+        for mapping, traits, mask in ((HERBIVORE_MAPPING, HERBIVORE_TRAITS, ~carn & layout),
+                                      (CARNIVORE_MAPPING, HERBIVORE_TRAITS, carn & layout),
+                                      (CARNIVORE_MAPPING, CARNIVORE_TRAITS, carn & ~layout)):
+            for col, trait in enumerate(traits):
+                if trait not in mapping:
+                    continue
+                offset, scale = mapping[trait]
+                column = getattr(self, trait)
+                values = column[rows]
+                values[mask] = offset + scale * alloc[mask, col]
+                column[rows] = values
+
+    # --- carnivore knowledge ---
+
+    def _lineage_columns(self, lineage):
+        """Column of `known` for each lineage root, or -1 for roots nobody knows."""
+        roots = self.known_roots
+        if len(roots) == 0:
+            return np.full(np.shape(lineage), -1)
+        pos = np.minimum(np.searchsorted(roots, lineage), len(roots) - 1)
+        return np.where(roots[pos] == lineage, pos, -1)
+
+    def _learn(self, rows, roots):
+        if len(rows) == 0:
+            return
+        known_roots = np.union1d(self.known_roots, roots)
+        self.known = widen(self.known, self.known_roots, known_roots)
+        self.known_roots = known_roots
+        self.known[rows, np.searchsorted(known_roots, roots)] = True
+
+    def _herd_pairs(self, herb, radius):
+        rep, x, y = self.rep[herb], self.x[herb], self.y[herb]
+        i, j, d = CellIndex(rep, x, y, self.grid_size).within(rep, x, y, radius)
+        other = i != j
+        return i[other], j[other], d[other]
+
+    def _threats(self, herb, carn, rng):
+        """Nearest recognised carnivore within reach of each herbivore, as in Organism.detect_and_flee.
+
+        Every herbivore rolls its sense against every carnivore of its
+        replicate in row order, and a success teaches it the carnivore's
+        lineage. Within a lineage it does not know only the first success
+        matters, so that is drawn directly as a geometric rank: the lineage is
+        learned if the rank falls inside it, and its members from that rank on
+        are recognised. Known lineages need no roll, and a rootless mutant's
+        roll only matters, so is only drawn, within reach. Returns the threat
+        (index into `carn`, -1 for none) and its distance.
+        """
+        rep, x, y = self.rep, self.x, self.y
+        sense = self.carnivore_sense[herb]
+        lineage = self.lineage[carn]
+        rooted = lineage != NO_LINEAGE
+        member = np.full(len(carn), -1)
+        roots, member[rooted], size = np.unique(lineage[rooted], return_inverse=True, return_counts=True)
+        # rank of every rooted carnivore within its lineage, in row order
+        rank = np.zeros(len(carn), dtype=np.int64)
+        rank[rooted] = rank_within(member[rooted], len(roots))
+
+        # one (herbivore, lineage) pair per lineage of the herbivore's replicate; roots sort by replicate
+        bounds = np.searchsorted(roots >> 32, np.arange(self.replicates + 1))
+        first, count = bounds[rep[herb]], np.diff(bounds)[rep[herb]]
+        offset = np.cumsum(count) - count
+        h = np.repeat(np.arange(len(herb)), count)
+        l = np.repeat(first - offset, count) + np.arange(len(h))
+        col = self._lineage_columns(roots)[l]
+        known = np.zeros(len(h), dtype=bool)
+        listed = np.flatnonzero(col >= 0)
+        known[listed] = self.known[herb[h[listed]], col[listed]]
+        unknown = np.flatnonzero(~known)
+        # first success among the lineage's rolls: P(rank >= k) = (1 - sense) ** k
+        u = rng.bind(rep[herb[h[unknown]]]).random(len(unknown))
+        s = sense[h[unknown]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g = np.floor(np.log1p(-u) / np.log1p(-s))
+        first_hit = np.zeros(len(h))
+        first_hit[unknown] = np.where(s <= 0, np.inf, np.where(s >= 1, 0, g))
+        learned = unknown[first_hit[unknown] < size[l[unknown]]]
+        self._learn(herb[h[learned]], roots[l[learned]])
+
+        reach = self.carnivore_detection[herb] * (1 + 0.5 * self.fear[herb])
+        q, c, d = CellIndex(rep[carn], x[carn], y[carn], self.grid_size).within(rep[herb], x[herb], y[herb], reach)
+        seen = np.zeros(len(q), dtype=bool)
+        lin = rooted[c]
+        seen[lin] = first_hit[offset[q[lin]] + member[c[lin]] - first[q[lin]]] <= rank[c[lin]]
+        rootless = np.flatnonzero(~lin)
+        seen[rootless] = rng.bind(rep[herb[q[rootless]]]).random(len(rootless)) < sense[q[rootless]]
+        q, c, d = q[seen], c[seen], d[seen]
+        order = np.lexsort((c, d, q))
+        q, c, d = q[order], c[order], d[order]
+        nearest = np.ones(len(q), dtype=bool)
+        nearest[1:] = q[1:] != q[:-1]
+        threat = np.full(len(herb), -1, dtype=np.int64)
+        dist = np.full(len(herb), np.inf)
+        threat[q[nearest]] = c[nearest]
+        dist[q[nearest]] = d[nearest]
+        return threat, dist
+
+    def share_knowledge(self):
+        """Vectorized share_carnivore_knowledge, run at the start of every frame.
+
+        Herds are the connected components of the links between herbivores
+        within each other's communication radius. Each herd pools its known
+        lineages, then every informed herbivore passes fear and a memory bump
+        to the herbivores within its radius; transfers compose (1 - fear
+        shrinks by a factor per sender), so all of them are applied at once.
+        """
+        herb = np.flatnonzero(~self.carnivore)
+        known = self.known[herb]
+        if not known.any():
+            return
+        radius = Organism.communication_radius * (1 + 0.3 * self.fear[herb])
+        i, j, d = self._herd_pairs(herb, radius)
+        mutual = d <= radius[j]
+        herd = components(len(herb), i[mutual], j[mutual])
+        pooled = np.zeros_like(known)
+        np.logical_or.at(pooled, herd, known)
+        known |= pooled[herd]
+        self.known[herb] = known
+        self.carnivores_seen[herb] = known.sum(axis=1)
+
+        informed = known.any(axis=1)[i]
+        i, j, d = i[informed], j[informed], d[informed]
+        transfer = 0.4 * (1 - d / radius[i])
+        calm = np.ones(len(herb))
+        np.multiply.at(calm, j, 1 - transfer)
+        bump = np.zeros(len(herb))
+        np.add.at(bump, j, 0.1 * transfer)
+        self.fear[herb] = np.minimum(1.0, 1 - (1 - self.fear[herb]) * calm)
+        if bump.any():
+            self._assign("memory", herb, np.minimum(1.0, self.memory[herb] + bump))
+            # memories fade at the new rate from now on
+            self.food_memory.retime(self.memory)
+
+    # --- movement ---
+
+    def _random_step(self, idx, rng):
+        if len(idx) == 0:
+            return
+        draws = rng.bind(self.rep[idx])
+        d = DIRECTIONS[draws.integers(0, 4, len(idx))]
+        go = draws.random(len(idx)) < self.speed[idx]
+        self.x[idx] = np.clip(self.x[idx] + go * d[:, 0], 0, self.grid_size - 1)
+        self.y[idx] = np.clip(self.y[idx] + go * d[:, 1], 0, self.grid_size - 1)
+
+    def _step_towards(self, idx, tx, ty, rng, sign=1):
+        dx = sign * np.sign(tx - self.x[idx])
+        dy = sign * np.sign(ty - self.y[idx])
+        # one axis per step; pick randomly when both differ
+        use_x = rng.bind(self.rep[idx]).random(len(idx)) < 0.5
+        both = (dx != 0) & (dy != 0)
+        dx = np.where(both & ~use_x, 0, dx)
+        dy = np.where(both & use_x, 0, dy)
+        return dx, dy
+
+    def _move_by(self, idx, dx, dy):
+        self.x[idx] = np.clip(self.x[idx] + dx, 0, self.grid_size - 1)
+        self.y[idx] = np.clip(self.y[idx] + dy, 0, self.grid_size - 1)
+
+    def move(self, label, rng, t=0):
+        """Advance every organism by one frame of movement (synchronous update).
+
+        Herbivores first share what they know (share_knowledge), then flee or
+        forage against the carnivore positions at the start of the frame;
+        carnivores then hunt the herbivores' new positions. Fleeing only counts
+        carnivores a herbivore recognises, by lineage or by a sense roll against
+        every carnivore of its replicate, as in Organism.detect_and_flee.
+        Foraging targets come from `label`, the (replicates, size, size)
+        nearest-food labels, and are remembered in food_memory; when their
+        replicate has no food at all, foragers set food_gene to 0 and walk at
+        random, as Organism.move does. `rng` is a ReplicateRandom over the
+        replicates' movement streams.
+        """
+        self.share_knowledge()
+        self.age += 1.0 * (1 + self.fear)
+        carn = self.carnivore
+        resting = carn & (self.rest_timer > 0)
+        self.rest_timer[resting] -= 1
+        active = ~resting
+        self.fear[active] = np.maximum(0.0, self.fear[active] - 0.05)
+
+        rep, B = self.rep, self.replicates
+        herb = np.flatnonzero(~carn)
+        hunters = np.flatnonzero(carn & active)
+        carn_idx = np.flatnonzero(carn)
+        self.food_memory.expire(t)
+
+        # --- herbivores: flee from the nearest recognised carnivore ---
+        fleeing = np.zeros(len(herb), dtype=bool)
+        if len(herb) and len(carn_idx):
+            near, dist = self._threats(herb, carn_idx, rng)
+            self.carnivores_seen[herb] = self.known[herb].sum(axis=1)
+            fleeing = near >= 0
+            f = herb[fleeing]
+            if len(f):
+                inc = 0.8 / (1 + np.exp(-0.5 * (dist[fleeing] - 3)))
+                self.fear[f] = np.minimum(1.0, self.fear[f] + inc)
+                self._assign("energy_efficiency", f, np.maximum(0.5, self.energy_efficiency[f] - 0.1 * inc))
+                effective_speed = self.speed[f] * (1 + 2.5 * self.fear[f] ** 0.7)
+                go = rng.bind(rep[f]).random(len(f)) < effective_speed
+                threat = carn_idx[near[fleeing]]
+                dx = -np.sign(self.x[threat] - self.x[f])
+                dy = -np.sign(self.y[threat] - self.y[f])
+                self._move_by(f[go], dx[go], dy[go])
+
+        # --- herbivores: forage; with no food in the replicate, give up the food gene and wander ---
+        foragers = herb[~fleeing]
+        target = label[rep[foragers], self.x[foragers], self.y[foragers]]
+        starving = target == NO_FOOD
+        hungry, foragers = foragers[starving], foragers[~starving]
+        tx, ty = np.divmod(target[~starving], self.grid_size)
+        if len(foragers):
+            capacity = (2 + 6 * self.alloc[foragers, 4]).astype(np.int64)
+            self.food_memory.record(foragers, tx, ty, t, self.fear[foragers], self.carnivores_seen[foragers],
+                                    capacity, self.memory[foragers])
+        self._assign("food_gene", hungry, 0.0)
+        self._random_step(hungry, rng)
+        if len(foragers):
+            dx, dy = self._step_towards(foragers, tx, ty, rng)
+            seek = rng.bind(rep[foragers]).random(len(foragers)) < self.food_gene[foragers]
+            self._move_by(foragers[seek], dx[seek], dy[seek])
+            self._random_step(foragers[~seek], rng)
+
+        # --- carnivores: hunt the nearest herbivore ---
+        if len(hunters):
+            has_prey = np.bincount(rep[herb], minlength=B) > 0
+            alone = hunters[~has_prey[rep[hunters]]]
+            hunters = hunters[has_prey[rep[hunters]]]
+            if len(hunters):
+                chase = rng.bind(rep[hunters]).random(len(hunters)) <= self.food_gene[hunters]
+                chasers = hunters[chase]
+                index = CellIndex(rep[herb], self.x[herb], self.y[herb], self.grid_size)
+                prey, _ = index.nearest(rep[chasers], self.x[chasers], self.y[chasers])
+                dx, dy = self._step_towards(chasers, self.x[herb[prey]], self.y[herb[prey]], rng)
+                self._move_by(chasers, dx, dy)
+                self._random_step(hunters[~chase], rng)
+            self._random_step(alone, rng)
+
+    # --- reproduction ---
+
+    def offspring(self, parents, rng, mutation_chance=0.1):
+        """Build a Population of children, one per parent index, mirroring Organism.division.
+
+        `rng` is a ReplicateRandom over the replicates' mutation streams.
+        """
+        child = Population(self.grid_size, self.replicates)
+        n = len(parents)
+        for name, _ in self.FIELDS:
+            setattr(child, name, getattr(self, name)[parents].copy())
+        child.alloc = self.alloc[parents].copy()
+        child.known, child.known_roots = self.known[parents], self.known_roots
+        child.food_memory = self.food_memory.take(parents)
+        rep = child.rep
+        child.id = self.next_id[rep] + rank_within(rep, self.replicates)
+        self.next_id += np.bincount(rep, minlength=self.replicates)
+        # a carnivore's child joins its lineage; the child of a root-less mutant founds one
+        founders = child.carnivore & (child.lineage == NO_LINEAGE)
+        child.lineage[founders] = (rep[founders] << 32) | child.id[founders]
+        child.age[:] = 0.0
+        child.generation += 1
+        child.rest_timer[:] = 0
+        child.food_touch[:] = NO_FRAME
+        child.last_meal[:] = NO_FRAME
+
+        # one mutation pass per trait layout over the whole allocation block
+        for layout, k in ((True, NUM_TRAITS), (False, len(CARNIVORE_TRAITS))):
+            rows = np.flatnonzero(child.herbivore_layout == layout)
+            if len(rows):
+                child.alloc[rows, :k] = mutate_allocations(child.alloc[rows, :k], rng.bind(rep[rows]))
+
+        herb = ~child.carnivore
+        child.fear[:] = np.where(herb, 0.2, 0.0)
+        child.carnivore_sense[herb] = np.clip(rng.bind(rep[herb]).normal(child.carnivore_sense[herb], 0.05), 0, 1)
+        child.express()
+
+        # herbivore -> carnivore mutants keep their herbivore allocation and expressed traits
+        mutants = np.flatnonzero(herb & (rng.bind(rep).random(n) < mutation_chance))
+        child.carnivore[mutants] = True
+        child.known[mutants] = False
+        # inherited memories fade at the child's own rate
+        child.food_memory.retime(child.memory)
+        return child
+
@@ -0,0 +1,179 @@
+from itertools import islice
+import numpy as np
+
+# independent streams a seeded run derives from its seed, in spawn order
+STREAMS = ("food", "events", "movement", "mutation", "placement")
+
+
+def make_streams(seed=None):
+    """One Philox Generator per name in STREAMS, all derived from `seed`.
+
+    Each stream comes from its own spawned SeedSequence, so adding draws to one
+    (say, more movement per frame) never shifts the numbers another one hands
+    out. A seed of None takes fresh OS entropy.
+    """
+    children = np.random.SeedSequence(seed).spawn(len(STREAMS))
+    return {name: np.random.Generator(np.random.Philox(child)) for name, child in zip(STREAMS, children)}
+
+
+class RandomBlock:
+    """Per-frame random number service backed by bulk draws from a numpy Generator.
+
+    Uniform and standard-normal variates are drawn in blocks and handed out one
+    at a time (as Python floats) or as slices of a separate normal block, so the
+    per-organism code pays a list step instead of a NumPy call per draw.
+    reserve() lets the caller pre-draw what a frame is expected to need;
+    running out mid-frame just draws another block.
+    """
+
+    def __init__(self, generator=None, block_size=1 << 14):
+        self.generator = np.random.default_rng() if generator is None else generator
+        self.block_size = block_size
+        self._uniform = []
+        self._next_uniform = iter(()).__next__
+        self._normal = []
+        self._next_normal = iter(()).__next__
+        self._vector = np.empty(0)
+        self._v = 0
+
+    def _pending(self, which):
+        # how many pre-drawn values are left, without consuming any
+        it = self._next_uniform.__self__ if which == "uniform" else self._next_normal.__self__
+        return it.__length_hint__()
+
+    def _draw_uniform(self, n):
+        rest = list(self._next_uniform.__self__)
+        self._uniform = rest + self.generator.random(n).tolist()
+        self._next_uniform = iter(self._uniform).__next__
+
+    def _draw_normal(self, n):
+        rest = list(self._next_normal.__self__)
+        self._normal = rest + self.generator.standard_normal(n).tolist()
+        self._next_normal = iter(self._normal).__next__
+
+    def reserve(self, uniforms=0, normals=0):
+        """Make sure at least this many variates of each kind are pre-drawn."""
+        if self._pending("uniform") < uniforms:
+            self._draw_uniform(max(uniforms, self.block_size))
+        if self._pending("normal") < normals:
+            self._draw_normal(max(normals, self.block_size))
+
+    def _reserve_vector(self, size):
+        if len(self._vector) - self._v < size:
+            self._vector = np.concatenate([self._vector[self._v:],
+                                           self.generator.standard_normal(max(size, self.block_size))])
+            self._v = 0
+
+    def random(self):
+        """One uniform float in [0, 1)."""
+        try:
+            return self._next_uniform()
+        except StopIteration:
+            self._draw_uniform(self.block_size)
+            return self._next_uniform()
+
+    def uniform(self, size):
+        """`size` uniforms in [0, 1) as an array."""
+        self.reserve(uniforms=size)
+        return np.fromiter(islice(self._next_uniform.__self__, size), float, size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        """Normal variates; a float when size is None, else an array of that length."""
+        if size is None:
+            try:
+                z = self._next_normal()
+            except StopIteration:
+                self._draw_normal(self.block_size)
+                z = self._next_normal()
+            return loc + scale * z
+        self._reserve_vector(size)
+        z = self._vector[self._v:self._v + size]
+        self._v += size
+        return loc + scale * z
+
+    def integers(self, low, high):
+        """One integer in [low, high)."""
+        n = high - low
+        return low + min(int(self.random() * n), n - 1)
+
+    def choice(self, seq):
+        # u < 1 guarantees int(u * n) < n for any realistic n
+        return seq[int(self.random() * len(seq))]
+
+    def weighted_choice(self, options, weights):
+        """One of `options`, picked with probability proportional to `weights`."""
+        target = self.random() * sum(weights)
+        for option, weight in zip(options, weights):
+            target -= weight
+            if target < 0:
+                return option
+        return options[-1]
+
+
+class ReplicateRandom:
+    """Independent random streams for B replicates, one numpy Generator each.
+
+    A draw names the replicate of every element (bind), and each replicate's
+    elements take their values from one call on its own Generator, in element
+    order. A replicate therefore makes exactly the Generator calls a run of it
+    alone would, whichever other replicates share the batch.
+    """
+
+    def __init__(self, generators):
+        self.generators = list(generators)
+
+    def __len__(self):
+        return len(self.generators)
+
+    def bind(self, rep):
+        """Generator-like view drawing for the elements of `rep` (see ReplicateDraws)."""
+        return ReplicateDraws(self.generators, rep)
+
+
+class ReplicateDraws:
+    """The numpy Generator calls the population code makes, for elements of known replicates.
+
+    A draw of `size` values hands every element size / len(rep) consecutive
+    ones (one when size is None), so rng.random(n), rng.integers(0, 4, n),
+    rng.normal(loc, scale) and (n, k) blocks read as they do on a Generator.
+    """
+
+    def __init__(self, generators, rep):
+        self.generators = generators
+        self.rep = np.asarray(rep, dtype=np.int64)
+
+    def take(self, rows):
+        """The same view for a subset of the elements."""
+        return ReplicateDraws(self.generators, self.rep[rows])
+
+    def _groups(self):
+        # (generator, element positions) of every replicate present, in element order
+        rep, b = self.rep, len(self.generators)
+        if b == 1:
+            return [(self.generators[0], np.arange(len(rep)))]
+        order = np.argsort(rep, kind="stable")
+        bounds = np.searchsorted(rep[order], np.arange(b + 1))
+        return [(self.generators[r], order[bounds[r]:bounds[r + 1]]) for r in range(b) if bounds[r + 1] > bounds[r]]
+
+    def _draw(self, size, draw, dtype=float):
+        n = len(self.rep)
+        total = n if size is None else int(np.prod(size))
+        if (total % n if n else total):
+            raise ValueError(f"draw of size {size} for {n} elements")
+        k = total // n if n else 0
+        out = np.empty((n, k), dtype=dtype)
+        for g, pos in self._groups():
+            out[pos] = draw(g, pos, len(pos) * k).reshape(len(pos), k)
+        return out.reshape(total if size is None else size)
+
+    def random(self, size=None):
+        return self._draw(size, lambda g, pos, m: g.random(m))
+
+    def integers(self, low, high, size=None):
+        return self._draw(size, lambda g, pos, m: g.integers(low, high, m), np.int64)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if np.ndim(loc):
+            # one mean per element
+            return self._draw(size, lambda g, pos, m: g.normal(loc[pos], scale, m))
+        return self._draw(size, lambda g, pos, m: g.normal(loc, scale, m))
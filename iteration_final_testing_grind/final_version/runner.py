@@ -0,0 +1,177 @@
+import argparse
+import time
+from grid import Grid
+from organism import Organism
+from rng import make_streams
+from stats import StatsRecorder
+from columnar import ColumnWriter
+from trajectory import TrajectoryRecorder
+from checkpoint import Checkpointer, load_checkpoint
+
+ENGINES = ("objects", "arrays")
+
+
+def make_grid(size=50, num_herbivores=5, num_carnivores=0, num_food=100, food_seed=42, verbose=False,
+              seed=None):
+    """Build a Grid populated the way main.py sets up a run.
+
+    With a seed the whole run is reproducible: Organism ids, lineages and
+    streams are reset, and placement, food, events, movement and mutation each
+    draw from their own stream of that seed. Two runs with the same seed and
+    engine match frame for frame, whichever process they run in.
+    """
+    if seed is not None:
+        Organism.reset(seed)
+    placement = make_streams(seed)["placement"]
+    xy = placement.integers(0, size, (num_herbivores + num_carnivores, 2)).tolist()
+    organisms = [
+        Organism(x, y, size, cannibalism=i >= num_herbivores)
+        for i, (x, y) in enumerate(xy)
+    ]
+    grid = Grid(size, num_organisms=num_herbivores + num_carnivores, num_food=num_food,
+                food_seed=food_seed, verbose=verbose, seed=seed)
+    grid.add_organisms(organisms)
+    return grid
+
+
+class Runner:
+    """Advances a Grid frame by frame with no rendering, as fast as the CPU allows.
+
+    `engine` picks Grid.advance ("objects") or the vectorized Grid.step
+    ("arrays"). Observers are callables `observer(grid, frame, stats)` run after
+    every frame with that frame's get_stats() output; rendering, recording and
+    logging all attach this way.
+    """
+
+    def __init__(self, grid, engine="objects", observers=()):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+        self.grid = grid
+        self.engine = engine
+        self.observers = list(observers)
+        self.frame = 0
+
+    @classmethod
+    def resume(cls, path, observers=()):
+        """A Runner continuing a checkpointed run from the frame it was saved at, on its engine."""
+        grid, frame, engine = load_checkpoint(path)
+        runner = cls(grid, engine=engine, observers=observers)
+        runner.frame = frame
+        return runner
+
+    def attach(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    def step(self):
+        frame = self.frame
+        if self.engine == "arrays":
+            self.grid.step(frame)
+        else:
+            self.grid.advance(frame)
+        stats = self.grid.get_stats(frame)
+        for observer in self.observers:
+            observer(self.grid, frame, stats)
+        self.frame += 1
+        return stats
+
+    def run(self, frames, collect=True):
+        """Advance `frames` frames and return their stats dicts.
+
+        With collect=False nothing is kept (attach a StatsRecorder instead) and
+        only the last frame's stats are returned.
+        """
+        if collect:
+            return [self.step() for _ in range(frames)]
+        stats = None
+        for _ in range(frames):
+            stats = self.step()
+        return stats
+
+
+class ScatterView:
+    """Observer that draws the lattice into matplotlib scatter artists."""
+
+    def __init__(self, herbivore_scatter, carnivore_scatter, food_scatter, every=1, pause=None):
+        self.artists = (herbivore_scatter, carnivore_scatter, food_scatter)
+        self.every = every
+        self.pause = pause
+
+    def __call__(self, grid, frame, stats):
+        if frame % self.every:
+            return
+        grid.render(*self.artists)
+        if self.pause is not None:
+            import matplotlib.pyplot as plt
+            plt.pause(self.pause)
+
+
+class StatsPrinter:
+    """Observer that prints a one-line summary every `every` frames."""
+
+    def __init__(self, every=100):
+        self.every = every
+
+    def __call__(self, grid, frame, stats):
+        if frame % self.every == 0:
+            print(f"frame {frame}: herbivores={stats['herbivores']} carnivores={stats['carnivores']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the herbivore/carnivore simulation headless.")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--herbivores", type=int, default=5)
+    parser.add_argument("--carnivores", type=int, default=0)
+    parser.add_argument("--food", type=int, default=100)
+    parser.add_argument("--food-seed", type=int, default=42)
+    parser.add_argument("--seed", type=int, help="run seed; same seed and engine reproduce the run")
+    parser.add_argument("--engine", choices=ENGINES, default="objects")
+    parser.add_argument("--every", type=int, default=100, help="print a summary every N frames (0 disables)")
+    parser.add_argument("--csv", help="write the per-frame get_stats output to this CSV file")
+    parser.add_argument("--columns", help="stream the per-frame get_stats output to this columnar directory")
+    parser.add_argument("--trajectory", help="record every organism's position and traits per frame to this directory")
+    parser.add_argument("--checkpoint", help="checkpoint the full run state to this file")
+    parser.add_argument("--checkpoint-every", type=int, default=1000)
+    parser.add_argument("--resume", help="continue the run saved in this checkpoint for --frames more frames")
+    parser.add_argument("--verbose", action="store_true", help="log food events")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        runner = Runner.resume(args.resume)
+    else:
+        grid = make_grid(args.size, args.herbivores, args.carnivores, args.food, args.food_seed, args.verbose,
+                         seed=args.seed)
+        runner = Runner(grid, engine=args.engine)
+    if args.every:
+        runner.attach(StatsPrinter(args.every))
+    recorder = runner.attach(StatsRecorder()) if args.csv else None
+    # a resumed run continues its stores from the checkpointed frame instead of overwriting them
+    resume_at = runner.frame if args.resume else None
+    writer = runner.attach(ColumnWriter(args.columns, resume=resume_at)) if args.columns else None
+    tracks = runner.attach(TrajectoryRecorder(args.trajectory, resume=resume_at)) if args.trajectory else None
+    stores = [store for store in (writer, tracks) if store is not None]
+    checkpoints = (runner.attach(Checkpointer(args.checkpoint, args.checkpoint_every, stores=stores))
+                   if args.checkpoint else None)
+
+    start = time.perf_counter()
+    try:
+        last = runner.run(args.frames, collect=False)
+    finally:
+        if writer is not None:
+            writer.close()
+        if tracks is not None:
+            tracks.close()
+        if checkpoints is not None:
+            checkpoints.close()
+    elapsed = time.perf_counter() - start
+    print(f"{args.frames} frames in {elapsed:.2f}s ({args.frames / max(elapsed, 1e-9):.1f} frames/s)")
+    print(last)
+
+    if recorder is not None:
+        from analysis import save_stats_to_csv
+        save_stats_to_csv(recorder, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import numpy as np
+
+
+class SpatialHash:
+    """Uniform-grid bucket index over organism positions.
+
+    Herbivores and carnivores are bucketed separately by (x // cell_size,
+    y // cell_size), and additionally by exact lattice cell for same-cell
+    lookups such as predation. Grid rebuilds the index at the start of every
+    frame and moves an organism between buckets whenever it changes position,
+    so queries always see current positions. Results are ordered like the
+    organism list the index was built from, which keeps tie-breaking identical
+    to a full scan. It also counts the carnivores of every lineage and ranks
+    each within its lineage in list order, for sense rolls against carnivores
+    that no radius query returns.
+    """
+
+    def __init__(self, grid_size, cell_size=8):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.buckets = ({}, {})  # indexed by the cannibalism flag
+        self.cells = ({}, {})  # exact (x, y) -> organisms, same indexing
+        self.counts = [0, 0]
+        self.order = {}
+        self.lineage_size = {}  # lineage root -> carnivores listed
+        self.lineage_rank = {}  # carnivore -> carnivores of its lineage listed before it
+        self.lineage_roots = frozenset()
+
+    def _cell(self, x, y):
+        return (x // self.cell_size, y // self.cell_size)
+
+    def rebuild(self, organisms):
+        self.buckets = ({}, {})
+        self.cells = ({}, {})
+        self.counts = [0, 0]
+        self.order = {}
+        self.lineage_size = {}
+        self.lineage_rank = {}
+        for i, org in enumerate(organisms):
+            self.order[org] = i
+            self.insert(org)
+            root = org.lineage_root
+            if org.cannibalism and root is not None:
+                self.lineage_rank[org] = self.lineage_size.get(root, 0)
+                self.lineage_size[root] = self.lineage_rank[org] + 1
+        self.lineage_roots = frozenset(self.lineage_size)
+
+    def insert(self, org):
+        species = bool(org.cannibalism)
+        self.buckets[species].setdefault(self._cell(org.x, org.y), []).append(org)
+        self.cells[species].setdefault((org.x, org.y), []).append(org)
+        self.counts[species] += 1
+        if org not in self.order:
+            self.order[org] = len(self.order)
+
+    def remove(self, org, x=None, y=None):
+        species = bool(org.cannibalism)
+        x = org.x if x is None else x
+        y = org.y if y is None else y
+        for buckets, key in ((self.buckets[species], self._cell(x, y)), (self.cells[species], (x, y))):
+            bucket = buckets[key]
+            bucket.remove(org)
+            if not bucket:
+                del buckets[key]
+        self.counts[species] -= 1
+
+    def move(self, org, old_x, old_y):
+        if (old_x, old_y) != (org.x, org.y):
+            self.remove(org, old_x, old_y)
+            self.insert(org)
+
+    def at(self, x, y, carnivore):
+        """Organisms of one species standing exactly on (x, y)."""
+        found = self.cells[bool(carnivore)].get((x, y))
+        if not found:
+            return []
+        return sorted(found, key=self.order.__getitem__)
+
+    def count(self, carnivore):
+        return self.counts[bool(carnivore)]
+
+    def within(self, x, y, radius, carnivore):
+        """Organisms of one species within Manhattan distance `radius` of (x, y)."""
+        buckets = self.buckets[bool(carnivore)]
+        if not buckets:
+            return []
+        r = int(radius)
+        x0, y0 = self._cell(max(0, x - r), max(0, y - r))
+        x1, y1 = self._cell(x + r, y + r)
+        found = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for org in buckets.get((cx, cy), ()):
+                    if abs(org.x - x) + abs(org.y - y) <= radius:
+                        found.append(org)
+        found.sort(key=self.order.__getitem__)
+        return found
+
+    def _ring(self, cx, cy, k):
+        if k == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-k, k + 1):
+            yield (cx + dx, cy - k)
+            yield (cx + dx, cy + k)
+        for dy in range(-k + 1, k):
+            yield (cx - k, cy + dy)
+            yield (cx + k, cy + dy)
+
+    def nearest(self, x, y, carnivore):
+        """Nearest organism of one species by Manhattan distance, or None."""
+        buckets = self.buckets[bool(carnivore)]
+        if not buckets:
+            return None
+        cx, cy = self._cell(x, y)
+        best, best_key = None, None
+        max_ring = self.grid_size // self.cell_size + 1
+        for k in range(max_ring + 1):
+            for cell in self._ring(cx, cy, k):
+                for org in buckets.get(cell, ()):
+                    key = (abs(org.x - x) + abs(org.y - y), self.order[org])
+                    if best_key is None or key < best_key:
+                        best, best_key = org, key
+            # anything in ring k+1 or beyond is at least k*cell_size+1 away
+            if best is not None and best_key[0] <= k * self.cell_size:
+                break
+        return best
+
+
+class CellIndex:
+    """Array counterpart of SpatialHash for the Population engine.
+
+    Points are sorted by (replicate, x // cell_size, y // cell_size), so the
+    points of one cell column of a query's box are a searchsorted range and
+    a query only looks at the cells its radius reaches, never at every point
+    of its replicate.
+    """
+
+    def __init__(self, rep, x, y, grid_size, cell_size=8):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.side = grid_size // cell_size + 1
+        self.x, self.y = x, y
+        key = self._key(rep, x // cell_size, y // cell_size)
+        self.order = np.argsort(key, kind="stable")
+        self.keys = key[self.order]
+
+    def _key(self, rep, cx, cy):
+        return (rep * self.side + cx) * self.side + cy
+
+    def within(self, rep, x, y, radius, chunk=1 << 20):
+        """(query, point, distance) of every point of the query's replicate within Manhattan distance radius.
+
+        Pairs come sorted by query, then point; `chunk` bounds the candidates
+        looked at in one go.
+        """
+        n = len(x)
+        radius = np.broadcast_to(radius, (n,))
+        r = np.floor(radius).astype(np.int64)
+        cs, last = self.cell_size, self.grid_size - 1
+        cx0, cx1 = np.maximum(x - r, 0) // cs, np.minimum(x + r, last) // cs
+        cy0, cy1 = np.maximum(y - r, 0) // cs, np.minimum(y + r, last) // cs
+        # one range of the sorted points per (query, cell column)
+        columns = cx1 - cx0 + 1
+        q = np.repeat(np.arange(n), columns)
+        cx = cx0[q] + np.arange(len(q)) - np.repeat(np.cumsum(columns) - columns, columns)
+        lo = np.searchsorted(self.keys, self._key(rep[q], cx, cy0[q]), side="left")
+        count = np.searchsorted(self.keys, self._key(rep[q], cx, cy1[q]), side="right") - lo
+        found = [np.zeros(0, dtype=np.int64)] * 3
+        total = np.cumsum(np.bincount(q, weights=count, minlength=n).astype(np.int64))
+        start = 0
+        while start < n:
+            done = total[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(total, done + chunk, side="right")))
+            a, b = np.searchsorted(q, [start, stop])
+            qq, cc = q[a:b], count[a:b]
+            qq = np.repeat(qq, cc)
+            pos = np.repeat(lo[a:b] - (np.cumsum(cc) - cc), cc) + np.arange(len(qq))
+            p = self.order[pos]
+            d = np.abs(x[qq] - self.x[p]) + np.abs(y[qq] - self.y[p])
+            keep = d <= radius[qq]
+            qq, p, d = qq[keep], p[keep], d[keep]
+            s = np.lexsort((p, qq))
+            found += [qq[s], p[s], d[s]]
+            start = stop
+        return tuple(np.concatenate(found[k::3]) for k in range(3))
+
+    def nearest(self, rep, x, y):
+        """Nearest point of each query's replicate (lowest index on ties) and its distance; -1 and inf for none."""
+        n = len(x)
+        idx = np.full(n, -1, dtype=np.int64)
+        dist = np.full(n, np.inf)
+        todo = np.arange(n)
+        radius = self.cell_size
+        while len(todo):
+            q, p, d = self.within(rep[todo], x[todo], y[todo], radius)
+            s = np.lexsort((p, d, q))
+            q, p, d = q[s], p[s], d[s]
+            first = np.ones(len(q), dtype=bool)
+            first[1:] = q[1:] != q[:-1]
+            idx[todo[q[first]]] = p[first]
+            dist[todo[q[first]]] = d[first]
+            # a box of this radius that found nothing says nothing about farther points
+            found = np.zeros(len(todo), dtype=bool)
+            found[q] = True
+            todo = todo[~found]
+            if radius >= 2 * self.grid_size:
+                break
+            radius *= 2
+        return idx, dist
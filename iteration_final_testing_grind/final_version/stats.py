@@ -0,0 +1,230 @@
+from collections.abc import Mapping
+import numpy as np
+
+TRACKED_TRAITS = ("speed", "lifespan", "food_gene", "energy_efficiency")
+# species index 0 is herbivores, 1 carnivores; the suffixes match the get_stats keys
+SPECIES = ("herb", "carni")
+
+
+def column_dtype(value):
+    """Storage dtype for one stats field: int64 for integers such as 'frame' and the counts, else float64."""
+    integer = isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+    return np.dtype(np.int64 if integer else np.float64)
+
+
+class RunningStats:
+    """Count, sum and sum of squares of each tracked trait per species, kept incrementally.
+
+    Births call add, deaths remove, and in-place trait changes change, so a
+    snapshot of means and standard deviations costs the same whatever the
+    population size. The *_rows variants do the same for whole array blocks of
+    the structure-of-arrays engine. Values are accumulated relative to a
+    per-trait shift (the mean at the last rebuild, or when a species reappears)
+    so the variance does not cancel away for near-constant traits. Sums pick up rounding drift over
+    very long runs; rebuild() and rebuild_rows() re-derive them from scratch.
+    """
+
+    def __init__(self, traits=TRACKED_TRAITS):
+        self.traits = tuple(traits)
+        self._column = {trait: j for j, trait in enumerate(self.traits)}
+        self.reset()
+
+    def reset(self, shift=None):
+        k = len(self.traits)
+        self.shift = shift or [[0.0] * k, [0.0] * k]
+        self.count = [0, 0]
+        self.sum = [[0.0] * k, [0.0] * k]
+        self.sumsq = [[0.0] * k, [0.0] * k]
+
+    def total(self):
+        return self.count[0] + self.count[1]
+
+    # --- one organism at a time ---
+
+    def _restart(self, s, shift):
+        # a species coming back from zero starts from exact zeros around its own values
+        k = len(self.traits)
+        self.shift[s] = list(shift)
+        self.sum[s] = [0.0] * k
+        self.sumsq[s] = [0.0] * k
+
+    def _apply(self, org, sign):
+        s = 1 if org.cannibalism else 0
+        if self.count[s] == 0 and sign > 0:
+            self._restart(s, [getattr(org, trait) for trait in self.traits])
+        self.count[s] += sign
+        total, sq, shift = self.sum[s], self.sumsq[s], self.shift[s]
+        for j, trait in enumerate(self.traits):
+            v = getattr(org, trait) - shift[j]
+            total[j] += sign * v
+            sq[j] += sign * v * v
+
+    def add(self, org):
+        self._apply(org, 1)
+
+    def remove(self, org):
+        self._apply(org, -1)
+
+    def change(self, org, trait, old, new):
+        s = 1 if org.cannibalism else 0
+        j = self._column[trait]
+        old -= self.shift[s][j]
+        new -= self.shift[s][j]
+        self.sum[s][j] += new - old
+        self.sumsq[s][j] += new * new - old * old
+
+    def rebuild(self, organisms):
+        shift = [[0.0] * len(self.traits), [0.0] * len(self.traits)]
+        for s in (0, 1):
+            group = [org for org in organisms if bool(org.cannibalism) == bool(s)]
+            if group:
+                shift[s] = [sum(getattr(org, trait) for org in group) / len(group) for trait in self.traits]
+        self.reset(shift)
+        for org in organisms:
+            self.add(org)
+
+    # --- array blocks ---
+
+    def _apply_rows(self, carnivore, columns, sign):
+        values = np.column_stack([np.asarray(c, dtype=float) for c in columns]) if len(carnivore) else None
+        for s, mask in ((0, ~carnivore), (1, carnivore)):
+            n = int(mask.sum())
+            if n == 0:
+                continue
+            if self.count[s] == 0 and sign > 0:
+                self._restart(s, values[mask].mean(axis=0).tolist())
+            block = values[mask] - self.shift[s]
+            self.count[s] += sign * n
+            self.sum[s] = (np.asarray(self.sum[s]) + sign * block.sum(axis=0)).tolist()
+            self.sumsq[s] = (np.asarray(self.sumsq[s]) + sign * (block * block).sum(axis=0)).tolist()
+
+    def add_rows(self, carnivore, columns):
+        """Add a block of organisms; `columns` holds one value array per tracked trait."""
+        self._apply_rows(np.asarray(carnivore, dtype=bool), columns, 1)
+
+    def remove_rows(self, carnivore, columns):
+        self._apply_rows(np.asarray(carnivore, dtype=bool), columns, -1)
+
+    def change_rows(self, carnivore, trait, old, new):
+        j = self._column[trait]
+        old = np.asarray(old, dtype=float)
+        new = np.broadcast_to(np.asarray(new, dtype=float), old.shape)
+        for s, mask in ((0, ~carnivore), (1, carnivore)):
+            if mask.any():
+                o = old[mask] - self.shift[s][j]
+                v = new[mask] - self.shift[s][j]
+                self.sum[s][j] += float((v - o).sum())
+                self.sumsq[s][j] += float((v * v - o * o).sum())
+
+    def rebuild_rows(self, carnivore, columns):
+        carnivore = np.asarray(carnivore, dtype=bool)
+        shift = [[0.0] * len(self.traits), [0.0] * len(self.traits)]
+        for s, mask in ((0, ~carnivore), (1, carnivore)):
+            if mask.any():
+                shift[s] = [float(np.mean(np.asarray(c, dtype=float)[mask])) for c in columns]
+        self.reset(shift)
+        self.add_rows(carnivore, columns)
+
+    # --- queries ---
+
+    def snapshot(self, frame):
+        """get_stats-style dict: counts plus mean_<trait>_<species> and std_<trait>_<species>."""
+        stats = {
+            'frame': frame,
+            'herbivores': self.count[0],
+            'carnivores': self.count[1],
+        }
+        for j, trait in enumerate(self.traits):
+            for s, species in enumerate(SPECIES):
+                n = self.count[s]
+                if n:
+                    mean = self.sum[s][j] / n
+                    var = max(0.0, self.sumsq[s][j] / n - mean * mean)
+                    stats[f'mean_{trait}_{species}'] = mean + self.shift[s][j]
+                    stats[f'std_{trait}_{species}'] = var ** 0.5
+                else:
+                    stats[f'mean_{trait}_{species}'] = np.nan
+                    stats[f'std_{trait}_{species}'] = np.nan
+        return stats
+
+
+class StatsRecorder(Mapping):
+    """Per-frame stats dicts stored column-wise in preallocated typed NumPy arrays.
+
+    Columns are laid out from the first record: int64 for integer fields such
+    as 'frame' and the counts, float64 for everything else. Storage grows by
+    at least `chunk` rows at a time, doubling as the run gets longer. With
+    `capacity` set the recorder is a ring buffer keeping only the last
+    `capacity` frames; every row is written twice, `capacity` apart, so the
+    retained window is always one contiguous slice.
+
+    The recorder is a read-only mapping of column name to array view, so the
+    analysis plotting functions take it directly and no data is copied. Views
+    reflect the storage at the time they are taken.
+
+    It is also a Runner observer: `recorder(grid, frame, stats)` appends stats.
+    """
+
+    def __init__(self, capacity=None, chunk=4096):
+        self.capacity = capacity
+        self.chunk = chunk
+        self._columns = {}
+        self._size = 0  # allocated rows (2 * capacity in ring mode)
+        self.written = 0  # frames recorded so far, including any overwritten ones
+
+    def _allocate(self, stats):
+        self._size = 2 * self.capacity if self.capacity else self.chunk
+        for key, value in stats.items():
+            self._columns[key] = np.empty(self._size, dtype=column_dtype(value))
+
+    def _grow(self):
+        self._size += max(self.chunk, self._size)
+        for key, column in self._columns.items():
+            grown = np.empty(self._size, dtype=column.dtype)
+            grown[:self.written] = column[:self.written]
+            self._columns[key] = grown
+
+    def append(self, stats):
+        if not self._columns:
+            self._allocate(stats)
+        if self.capacity:
+            i = self.written % self.capacity
+            for key, column in self._columns.items():
+                column[i] = column[i + self.capacity] = stats[key]
+        else:
+            if self.written == self._size:
+                self._grow()
+            i = self.written
+            for key, column in self._columns.items():
+                column[i] = stats[key]
+        self.written += 1
+
+    def __call__(self, grid, frame, stats):
+        self.append(stats)
+
+    @property
+    def frames(self):
+        """Number of frames currently held."""
+        return min(self.written, self.capacity) if self.capacity else self.written
+
+    def _window(self):
+        n = self.frames
+        start = (self.written - n) % self.capacity if self.capacity else 0
+        return start, start + n
+
+    def __getitem__(self, key):
+        start, stop = self._window()
+        return self._columns[key][start:stop]
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def last(self):
+        """The most recent record as a stats dict."""
+        return {key: column[-1].item() for key, column in self.items()}
+
+    def as_dict(self):
+        return {key: self[key] for key in self._columns}
@@ -0,0 +1,241 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from runner import make_grid, Runner
+from stats import StatsRecorder, TRACKED_TRAITS, SPECIES
+
+# make_grid arguments a run can vary
+SETUP_PARAMS = ("size", "num_herbivores", "num_carnivores", "num_food", "food_seed", "seed")
+# Grid attributes set after construction
+GRID_PARAMS = ("carnivore_division_probab", "carnivore_starvation_time", "food_respawn_delay")
+
+SUMMARY_FIELDS = [
+    "frames_run", "seconds",
+    "herbivores", "carnivores",
+    "mean_herbivores", "mean_carnivores",
+    "peak_herbivores", "peak_carnivores",
+    "herbivore_extinction", "carnivore_extinction",
+]
+# last-frame trait means, copied from get_stats
+TRAIT_FIELDS = [f"mean_{trait}_{species}" for trait in TRACKED_TRAITS for species in SPECIES]
+SUMMARY_FIELDS += TRAIT_FIELDS
+
+
+def expand(spec):
+    """Runs of a sweep as a list of parameter dicts.
+
+    `spec` is either a list of dicts, taken as is, or a dict mapping each
+    parameter to a list of values, expanded to their full product.
+    """
+    if isinstance(spec, dict):
+        names = list(spec)
+        return [dict(zip(names, values)) for values in itertools.product(*(spec[n] for n in names))]
+    return [dict(params) for params in spec]
+
+
+def check_params(runs):
+    known = set(SETUP_PARAMS) | set(GRID_PARAMS)
+    for params in runs:
+        unknown = set(params) - known
+        if unknown:
+            raise ValueError(f"unknown sweep parameters {sorted(unknown)}, expected some of {sorted(known)}")
+
+
+def build(params):
+    setup = {k: v for k, v in params.items() if k in SETUP_PARAMS}
+    grid = make_grid(verbose=False, **setup)
+    for name in GRID_PARAMS:
+        if name in params:
+            setattr(grid, name, params[name])
+    if "food_respawn_delay" in params:
+        # food events restore the delay from its base value
+        grid.base_food_respawn_delay = params["food_respawn_delay"]
+    return grid
+
+
+def extinction(counts, frames):
+    """Frame at which a species that was present died out, or None."""
+    if not len(counts) or counts[0] == 0:
+        return None
+    gone = np.flatnonzero(counts == 0)
+    return int(frames[gone[0]]) if len(gone) else None
+
+
+def run_one(params, frames=2000, engine="arrays"):
+    """Run one headless simulation and return its summary row (SUMMARY_FIELDS).
+
+    Stops early once both species are extinct.
+    """
+    start = time.perf_counter()
+    runner = Runner(build(params), engine=engine)
+    recorder = runner.attach(StatsRecorder())
+    for _ in range(frames):
+        stats = runner.step()
+        if stats["herbivores"] == 0 and stats["carnivores"] == 0:
+            break
+    herb, carni = recorder["herbivores"], recorder["carnivores"]
+    summary = {
+        "frames_run": recorder.frames,
+        "seconds": round(time.perf_counter() - start, 3),
+        "herbivores": int(herb[-1]),
+        "carnivores": int(carni[-1]),
+        "mean_herbivores": float(herb.mean()),
+        "mean_carnivores": float(carni.mean()),
+        "peak_herbivores": int(herb.max()),
+        "peak_carnivores": int(carni.max()),
+        "herbivore_extinction": extinction(herb, recorder["frame"]),
+        "carnivore_extinction": extinction(carni, recorder["frame"]),
+    }
+    for key in TRAIT_FIELDS:
+        summary[key] = stats[key]
+    return summary
+
+
+def run_key(params, param_names):
+    """A run's identity in a results table: its parameter values as the CSV spells them."""
+    return tuple("" if params.get(name) is None else str(params[name]) for name in param_names)
+
+
+def finished_runs(path, param_names):
+    """run_keys of the runs that completed in a results file, so a sweep can be restarted where it stopped.
+
+    Rows that recorded an error, or were cut short by a crash, do not count
+    and are run again.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        return {tuple(row[name] for name in param_names) for row in csv.DictReader(f) if row.get("error") == ""}
+
+
+class ResultsTable:
+    """Append-only CSV of sweep results, one row per run, flushed as each run finishes.
+
+    Appending to an existing file requires its header to match the sweep's
+    columns, so rows never end up under the wrong parameter names.
+    """
+
+    def __init__(self, path, param_names):
+        self.path = path
+        fields = ["run_id"] + list(param_names) + SUMMARY_FIELDS + ["error"]
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not fresh:
+            with open(path, newline="") as f:
+                header = next(csv.reader(f))
+            if header != fields:
+                raise ValueError(f"{path} holds results with columns {header}, not this sweep's {fields}; "
+                                 "write to a new file")
+        self._file = open(path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=fields)
+        if fresh:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, run_id, params, summary=None, error=None):
+        row = {"run_id": run_id, **params, **(summary or {}), "error": error or ""}
+        self._writer.writerow(row)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _fan_out(pending, table, frames, engine, workers, log):
+    """Run `pending` (run_id, params) pairs on one pool; return the ones lost to a broken pool."""
+    lost = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_one, params, frames, engine): (run_id, params) for run_id, params in pending}
+        for future in as_completed(futures):
+            run_id, params = futures[future]
+            try:
+                summary = future.result()
+            except BrokenProcessPool:
+                lost.append((run_id, params))
+                continue
+            except Exception as e:
+                table.write(run_id, params, error="".join(traceback.format_exception_only(type(e), e)).strip())
+                log(f"run {run_id} failed: {e}")
+                continue
+            table.write(run_id, params, summary)
+            log(f"run {run_id} done in {summary['seconds']}s: {params}")
+    return sorted(lost, key=lambda item: item[0])
+
+
+def sweep(spec, out, frames=2000, engine="arrays", workers=None, log=print):
+    """Fan the runs of `spec` (see expand) out over a process pool, streaming summaries to `out`.
+
+    Each finished run is appended to the CSV at once, so nothing finished is
+    lost if the sweep dies; rerunning skips the runs whose parameters already
+    have a result row, whatever their position in the spec, and retries the
+    ones that failed. A worker that dies outright (segfault, out of memory)
+    breaks the pool and fails every unfinished run, started or not: those are
+    fanned out again over a fresh pool, and a group that breaks its pool
+    again is split in halves until the run that kills its worker is alone and
+    recorded as crashed. Returns the number of runs carried out.
+    """
+    runs = expand(spec)
+    check_params(runs)
+    param_names = list(dict.fromkeys(name for params in runs for name in params))
+    table = ResultsTable(out, param_names)
+    done = finished_runs(out, param_names)
+    pending = [(run_id, params) for run_id, params in enumerate(runs) if run_key(params, param_names) not in done]
+    try:
+        groups = [_fan_out(pending, table, frames, engine, workers, log)]
+        while groups:
+            group = groups.pop()
+            if len(group) == 1:
+                if _fan_out(group, table, frames, engine, 1, log):
+                    run_id, params = group[0]
+                    table.write(run_id, params, error="worker process crashed")
+                    log(f"run {run_id} crashed its worker: {params}")
+            elif group:
+                lost = _fan_out(group, table, frames, engine, workers, log)
+                if len(lost) > 1:
+                    groups += [lost[len(lost) // 2:], lost[:len(lost) // 2]]
+                else:
+                    groups.append(lost)
+    finally:
+        table.close()
+    return len(pending)
+
+
+def parse_value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep Grid parameters over headless runs on all cores.")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"values to sweep; any of {', '.join(SETUP_PARAMS + GRID_PARAMS)}")
+    parser.add_argument("--seeds", type=int, default=1, help="replicates per parameter combination (seeds 0..N-1)")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--engine", choices=("objects", "arrays"), default="arrays")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="sweep.csv", help="results table, appended to and resumable")
+    args = parser.parse_args(argv)
+
+    spec = {}
+    for item in args.param:
+        name, _, values = item.partition("=")
+        spec[name] = [parse_value(v) for v in values.split(",")]
+    spec.setdefault("seed", list(range(args.seeds)))
+
+    start = time.perf_counter()
+    n = sweep(spec, args.out, frames=args.frames, engine=args.engine, workers=args.workers)
+    print(f"{n} runs in {time.perf_counter() - start:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import pytest
+from checkpoint import Checkpointer
+from runner import Runner, make_grid
+
+
+def seeded_runner(engine):
+    return Runner(make_grid(30, 40, 4, seed=11), engine=engine)
+
+
+@pytest.mark.parametrize("engine", ["objects", "arrays"])
+def test_resume_matches_uninterrupted_run(engine, tmp_path):
+    frames, at = 80, 30
+    expected = seeded_runner(engine).run(frames)
+
+    path = str(tmp_path / "run.ckpt")
+    runner = seeded_runner(engine)
+    checkpoints = runner.attach(Checkpointer(path, every=at))
+    before = runner.run(at)
+    checkpoints.close()
+    runner.observers.remove(checkpoints)
+    # carrying on past the checkpoint moves the class-level ids and streams on; resume must restore them
+    runner.run(frames - at)
+
+    after = Runner.resume(path).run(frames - at)
+    assert before + after == expected
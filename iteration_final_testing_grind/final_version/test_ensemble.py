@@ -0,0 +1,50 @@
+import numpy as np
+from ensemble import QuantileBands, EnsembleStats
+
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def fold(values, exact=16):
+    bands = QuantileBands(QUANTILES, values.shape[1], exact)
+    for row in values:
+        bands.add(row)
+    return bands.values()
+
+
+def test_bands_are_exact_up_to_the_sample_size():
+    rng = np.random.default_rng(1)
+    for replicates in (1, 2, 5, 16):
+        values = rng.normal(size=(replicates, 40))
+        for p, band in zip(QUANTILES, fold(values)):
+            assert np.allclose(band, np.quantile(values, p, axis=0))
+
+
+def test_p2_bands_track_np_quantile():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=(2000, 200))
+    for p, band in zip(QUANTILES, fold(values)):
+        # P² is an estimate: compare the fraction of values below it, which is p for np.quantile
+        below = (values < band).mean(axis=0)
+        assert np.abs(below - p).mean() < 0.005
+        assert np.abs(below - p).max() < 0.05
+        assert np.abs(band - np.quantile(values, p, axis=0)).mean() < 0.05
+
+
+def test_nan_entries_are_left_out():
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=(10, 6))
+    values[::3, 2] = np.nan
+    for p, band in zip(QUANTILES, fold(values)):
+        assert np.allclose(band, np.nanquantile(values, p, axis=0))
+
+
+def test_mean_and_std_match_numpy():
+    rng = np.random.default_rng(4)
+    counts = rng.integers(0, 50, (30, 20)).astype(float)
+    ensemble = EnsembleStats(20, keys=("herbivores",))
+    for row in counts:
+        ensemble.add({"herbivores": row})
+    bands = ensemble.bands()
+    assert np.allclose(bands["herbivores"], counts.mean(axis=0))
+    assert np.allclose(bands["herbivores_std"], counts.std(axis=0, ddof=1))
+    assert np.allclose(bands["extinct_herbivores"], (counts == 0).mean(axis=0))
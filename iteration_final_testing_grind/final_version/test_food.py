@@ -0,0 +1,39 @@
+import numpy as np
+from food import FoodStore, NO_FOOD, UNREACHED
+
+
+def brute_force(occupied):
+    """dist and label of every cell by scanning all food cells; ties go to the lowest index."""
+    size = occupied.shape[0]
+    food = np.flatnonzero(occupied)
+    x, y = np.divmod(np.arange(size * size), size)
+    if len(food) == 0:
+        return np.full((size, size), UNREACHED), np.full((size, size), NO_FOOD)
+    fx, fy = np.divmod(food, size)
+    d = np.abs(x[:, None] - fx) + np.abs(y[:, None] - fy)
+    best = np.argmin(d, axis=1)  # first minimum, i.e. the lowest food index
+    return d.min(axis=1).reshape(size, size), food[best].reshape(size, size)
+
+
+def test_field_matches_brute_force_under_random_eat_and_spawn():
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 7, 16):
+        cells = rng.integers(0, size, (size, 2))
+        store = FoodStore(size, map(tuple, cells))
+        for _ in range(200):
+            pos = tuple(int(v) for v in rng.integers(0, size, 2))
+            if pos in store and rng.random() < 0.5:
+                store.eat(pos)
+            else:
+                store.spawn(pos)
+            dist, label = brute_force(store.occupied)
+            assert (store.field.dist == dist).all()
+            assert (store.field.label == label).all()
+
+
+def test_emptied_store_has_no_food_anywhere():
+    store = FoodStore(5, [(0, 0), (4, 4)])
+    store.eat((0, 0))
+    store.eat((4, 4))
+    assert (store.field.label == NO_FOOD).all()
+    assert store.nearest(2, 2) is None
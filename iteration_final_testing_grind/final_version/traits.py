@@ -0,0 +1,136 @@
+import numpy as np
+
+HERBIVORE_TRAITS = ("lifespan", "speed", "food_gene", "carnivore_detection", "memory", "energy_efficiency")
+CARNIVORE_TRAITS = ("lifespan", "speed", "stealth", "energy_efficiency", "food_gene")
+
+# an allocation vector's length tells which layout it uses
+TRAIT_LAYOUTS = {len(HERBIVORE_TRAITS): HERBIVORE_TRAITS, len(CARNIVORE_TRAITS): CARNIVORE_TRAITS}
+
+# trait -> (offset, scale) of the linear allocation mapping
+HERBIVORE_MAPPING = {
+    "lifespan": (500, 1500),
+    "speed": (0.05, 0.85),
+    "food_gene": (0.05, 0.45),
+    "carnivore_detection": (2, 12),
+    "memory": (0.05, 0.9),
+    "energy_efficiency": (0.5, 0.5),
+}
+CARNIVORE_MAPPING = {
+    "lifespan": (600, 1200),
+    "speed": (0.1, 0.8),
+    "stealth": (0.05, 0.9),
+    "energy_efficiency": (0.5, 0.5),
+    "food_gene": (0.05, 0.45),
+}
+
+
+def softmax(x):
+    e_x = np.exp(x - np.max(x))
+    return e_x / e_x.sum()
+
+def convex_tradeoff(x, y, budget=1.0):
+    return (x**0.7 + y**0.7) <= budget**0.7
+
+def concave_tradeoff(x, y, budget=1.0):
+    return (x**1.3 + y**1.3) <= budget**1.3
+
+
+def softmax_rows(x):
+    e_x = np.exp(x - x.max(axis=1, keepdims=True))
+    return e_x / e_x.sum(axis=1, keepdims=True)
+
+def feasible(allocs):
+    """Row mask of allocations that satisfy their layout's trade-off constraint."""
+    if allocs.shape[1] == len(HERBIVORE_TRAITS):
+        return convex_tradeoff(allocs[:, 0], allocs[:, 1])
+    return concave_tradeoff(allocs[:, 1], allocs[:, 2])
+
+
+class Acceptance:
+    """Running proposal and acceptance counts of one allocation sampler."""
+
+    def __init__(self):
+        self.proposed = 0
+        self.accepted = 0
+
+    def record(self, proposed, accepted):
+        self.proposed += int(proposed)
+        self.accepted += int(accepted)
+
+    @property
+    def rate(self):
+        return self.accepted / self.proposed if self.proposed else 1.0
+
+    def __repr__(self):
+        return f"Acceptance({self.accepted}/{self.proposed}, rate={self.rate:.3f})"
+
+
+# sampler name -> Acceptance, shared by every caller of the samplers below
+ACCEPTANCE = {"prior": Acceptance(), "mutation": Acceptance()}
+
+
+def _standard_normal(rng, shape):
+    # works for numpy Generators and RandomBlock alike
+    return rng.normal(0.0, 1.0, shape[0] * shape[1]).reshape(shape)
+
+def sample_allocations(prior, n, rng, scale=0.07):
+    """`n` feasible allocations drawn as softmax(|N(prior, scale)|).
+
+    Proposals are drawn in whole batches, oversized by the running acceptance
+    rate so one round is normally enough, and the feasible rows are kept. The
+    result has the same distribution as redrawing one vector at a time.
+    """
+    prior = np.asarray(prior, dtype=float)
+    stats = ACCEPTANCE["prior"]
+    out = np.empty((n, len(prior)))
+    filled = 0
+    while filled < n:
+        need = n - filled
+        batch = int(need / max(stats.rate, 0.05) * 1.1) + 1
+        a = softmax_rows(np.abs(prior + scale * _standard_normal(rng, (batch, len(prior)))))
+        mask = feasible(a)
+        stats.record(batch, mask.sum())
+        ok = a[mask][:need]
+        out[filled:filled + len(ok)] = ok
+        filled += len(ok)
+    return out
+
+def mutate_allocations(allocs, rng, scale=0.04, retry_scale=0.03):
+    """Mutated copies of the rows of `allocs` (all in one layout), each made feasible.
+
+    Every row gets N(0, scale) noise, is clipped and renormalised; rows that
+    break the trade-off keep taking N(0, retry_scale) steps until they satisfy
+    it, as division always did, but all pending rows step together.
+    """
+    stats = ACCEPTANCE["mutation"]
+    a = softmax_rows(np.clip(allocs + scale * _standard_normal(rng, allocs.shape), 0.01, None))
+    pending = np.flatnonzero(~feasible(a))
+    stats.record(len(a), len(a) - len(pending))
+    while len(pending):
+        # draws bound to the rows (ReplicateDraws) follow the rows still pending
+        draws = rng.take(pending) if hasattr(rng, "take") else rng
+        step = retry_scale * _standard_normal(draws, (len(pending), a.shape[1]))
+        a[pending] = softmax_rows(np.abs(a[pending] + step))
+        ok = feasible(a[pending])
+        stats.record(len(pending), ok.sum())
+        pending = pending[~ok]
+    return a
+
+_COLUMN_MAPS = {}  # (layout length, id(mapping)) -> (traits, columns, offsets, scales)
+
+def express_columns(allocs, mapping):
+    """Mapped trait values for a block of allocations as (trait, values) column pairs.
+
+    Column-wise counterpart of Organism.express_traits: values are Python
+    lists, with lifespan truncated to int.
+    """
+    key = (allocs.shape[1], id(mapping))
+    if key not in _COLUMN_MAPS:
+        layout = TRAIT_LAYOUTS[allocs.shape[1]]
+        traits = [t for t in layout if t in mapping]
+        _COLUMN_MAPS[key] = (traits, [layout.index(t) for t in traits],
+                             np.array([mapping[t][0] for t in traits], dtype=float),
+                             np.array([mapping[t][1] for t in traits], dtype=float))
+    traits, columns, offsets, scales = _COLUMN_MAPS[key]
+    values = (offsets + scales * allocs[:, columns]).T.tolist()
+    return [(t, [int(v) for v in col] if t == "lifespan" else col) for t, col in zip(traits, values)]
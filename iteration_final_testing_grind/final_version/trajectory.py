@@ -0,0 +1,231 @@
+import json
+import os
+import numpy as np
+from stats import TRACKED_TRAITS
+
+HEADER = "header.json"
+RECORDS = "records.bin"
+INDEX = "index.bin"
+LIFETIMES = "lifetimes.npy"
+FORMAT_VERSION = 1
+
+# one index entry per recorded frame: where its records start and how many there are
+INDEX_DTYPE = np.dtype([("frame", "<i8"), ("offset", "<i8"), ("count", "<i8")])
+NOT_SEEN = -1
+
+
+def record_dtype(traits):
+    fields = [("id", "<i8"), ("x", "<i4"), ("y", "<i4"), ("carnivore", "u1")]
+    return np.dtype(fields + [(trait, "<f4") for trait in traits])
+
+
+class TrajectoryRecorder:
+    """Opt-in Runner observer that appends every frame's organisms to an on-disk trajectory.
+
+    Each frame adds one fixed-size record per organism (id, x, y, species and
+    the chosen traits as float32), sorted by id, to an append-only records
+    file, plus a (frame, offset, count) entry to an index file. Frames are
+    buffered and written `flush_every` frames at a time; the JSON header,
+    rewritten atomically after each write, only ever counts complete frames.
+    The first and last frame each organism id was seen are kept alongside so
+    a reader can go straight to one organism's frames. With `resume` set to
+    a frame, an existing directory is continued instead of overwritten, as
+    ColumnWriter does.
+    """
+
+    def __init__(self, path, traits=TRACKED_TRAITS, flush_every=256, resume=None):
+        self.path = path
+        self.traits = tuple(traits)
+        self.dtype = record_dtype(self.traits)
+        self.flush_every = flush_every
+        self.frames = 0
+        self.rows = 0
+        self._pending = []
+        self._first = np.full(0, NOT_SEEN, dtype=np.int64)
+        self._last = np.full(0, NOT_SEEN, dtype=np.int64)
+        os.makedirs(path, exist_ok=True)
+        mode = "wb"
+        if resume is not None and os.path.exists(os.path.join(path, HEADER)):
+            self._reopen(resume)
+            mode = "ab"
+        self._records = open(os.path.join(path, RECORDS), mode)
+        self._index = open(os.path.join(path, INDEX), mode)
+        self._write_header()
+
+    def _reopen(self, frame):
+        with open(os.path.join(self.path, HEADER)) as f:
+            header = json.load(f)
+        if tuple(header["traits"]) != self.traits:
+            raise ValueError(f"{self.path} records traits {header['traits']}, not {list(self.traits)}")
+        index = np.fromfile(os.path.join(self.path, INDEX), dtype=INDEX_DTYPE, count=header["frames"])
+        kept = int(np.searchsorted(index["frame"], frame))
+        if kept and index["frame"][kept - 1] != frame - 1:
+            raise ValueError(f"{self.path} stops at frame {index['frame'][kept - 1]}, cannot continue at frame {frame}")
+        self.frames = kept
+        self.rows = int(index["offset"][kept]) if kept < len(index) else header["rows"]
+        with open(os.path.join(self.path, RECORDS), "ab") as f:
+            f.truncate(self.rows * self.dtype.itemsize)
+        with open(os.path.join(self.path, INDEX), "ab") as f:
+            f.truncate(kept * INDEX_DTYPE.itemsize)
+        if kept:
+            # frames are recorded back to back and an organism is in every frame of
+            # its life, so one still alive at the last kept frame was last seen there
+            end = int(index["frame"][kept - 1])
+            ids, first, last = np.load(os.path.join(self.path, LIFETIMES))
+            seen = first <= end
+            self._first = np.full(int(ids[seen].max()) + 1 if seen.any() else 0, NOT_SEEN, dtype=np.int64)
+            self._last = self._first.copy()
+            self._first[ids[seen]] = first[seen]
+            self._last[ids[seen]] = np.minimum(last[seen], end)
+        self._write_lifetimes()
+
+    def _columns(self, grid):
+        pop = grid.population
+        if pop is not None:
+            return pop.id, pop.x, pop.y, pop.carnivore, [getattr(pop, trait) for trait in self.traits]
+        orgs = grid.organisms
+        n = len(orgs)
+        ids = np.fromiter((o.id for o in orgs), np.int64, n)
+        xs = np.fromiter((o.x for o in orgs), np.int64, n)
+        ys = np.fromiter((o.y for o in orgs), np.int64, n)
+        carn = np.fromiter((o.cannibalism for o in orgs), np.bool_, n)
+        traits = [np.fromiter((getattr(o, trait) for o in orgs), np.float64, n) for trait in self.traits]
+        return ids, xs, ys, carn, traits
+
+    def record(self, grid, frame):
+        ids, xs, ys, carn, traits = self._columns(grid)
+        block = np.empty(len(ids), dtype=self.dtype)
+        block["id"] = ids
+        block["x"] = xs
+        block["y"] = ys
+        block["carnivore"] = carn
+        for trait, values in zip(self.traits, traits):
+            block[trait] = values
+        # both engines keep ids ascending; sort only if something reordered them
+        if len(block) > 1 and (np.diff(block["id"]) < 0).any():
+            block = block[np.argsort(block["id"], kind="stable")]
+        self._see(block["id"], frame)
+        self._pending.append((frame, block))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def __call__(self, grid, frame, stats):
+        self.record(grid, frame)
+
+    def _see(self, ids, frame):
+        if not len(ids):
+            return
+        top = int(ids[-1]) + 1
+        if top > len(self._first):
+            grow = max(top, 2 * len(self._first))
+            self._first = np.concatenate([self._first, np.full(grow - len(self._first), NOT_SEEN, np.int64)])
+            self._last = np.concatenate([self._last, np.full(grow - len(self._last), NOT_SEEN, np.int64)])
+        new = ids[self._first[ids] == NOT_SEEN]
+        self._first[new] = frame
+        self._last[ids] = frame
+
+    def flush(self):
+        if not self._pending:
+            return
+        index = np.empty(len(self._pending), dtype=INDEX_DTYPE)
+        offset = self.rows
+        for i, (frame, block) in enumerate(self._pending):
+            index[i] = (frame, offset, len(block))
+            offset += len(block)
+        self._records.write(b"".join(block.tobytes() for _, block in self._pending))
+        self._records.flush()
+        self._index.write(index.tobytes())
+        self._index.flush()
+        self.rows = offset
+        self.frames += len(self._pending)
+        self._pending = []
+        self._write_lifetimes()
+        self._write_header()
+
+    def _write_lifetimes(self):
+        seen = np.flatnonzero(self._first != NOT_SEEN)
+        tmp = os.path.join(self.path, LIFETIMES + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.stack([seen, self._first[seen], self._last[seen]]))
+        os.replace(tmp, os.path.join(self.path, LIFETIMES))
+
+    def _write_header(self):
+        header = {
+            "version": FORMAT_VERSION,
+            "frames": self.frames,
+            "rows": self.rows,
+            "traits": list(self.traits),
+        }
+        tmp = os.path.join(self.path, HEADER + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp, os.path.join(self.path, HEADER))
+
+    def close(self):
+        self.flush()
+        self._records.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trajectory:
+    """Read side of a TrajectoryRecorder directory, memory-mapped.
+
+    frame(f) returns that frame's records and track(id) one organism's
+    records over its lifetime; only the pages those touch are read.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, HEADER)) as f:
+            header = json.load(f)
+        self.traits = tuple(header["traits"])
+        self.dtype = record_dtype(self.traits)
+        rows, frames = header["rows"], header["frames"]
+        self.records = self._map(os.path.join(path, RECORDS), self.dtype, rows)
+        self.index = self._map(os.path.join(path, INDEX), INDEX_DTYPE, frames)
+        ids, first, last = np.load(os.path.join(path, LIFETIMES)) if frames else np.zeros((3, 0), np.int64)
+        self.lifetimes = dict(zip(ids.tolist(), zip(first.tolist(), last.tolist())))
+
+    @staticmethod
+    def _map(filename, dtype, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode="r", shape=(n,))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def frame_numbers(self):
+        return self.index["frame"]
+
+    def _entry(self, frame):
+        i = int(np.searchsorted(self.index["frame"], frame))
+        if i == len(self.index) or self.index["frame"][i] != frame:
+            raise KeyError(f"frame {frame} was not recorded")
+        return i
+
+    def frame(self, frame):
+        """All records of one frame, sorted by id."""
+        _, offset, count = self.index[self._entry(frame)]
+        return self.records[offset:offset + count]
+
+    def track(self, organism_id):
+        """Records of one organism in frame order, with the frame numbers they belong to."""
+        if organism_id not in self.lifetimes:
+            raise KeyError(f"organism {organism_id} was never recorded")
+        first, last = self.lifetimes[organism_id]
+        lo, hi = self._entry(first), self._entry(last) + 1
+        frames, rows = [], []
+        for frame, offset, count in self.index[lo:hi].tolist():
+            ids = self.records["id"][offset:offset + count]
+            j = int(np.searchsorted(ids, organism_id))
+            if j < count and ids[j] == organism_id:
+                frames.append(frame)
+                rows.append(offset + j)
+        return np.array(frames, dtype=np.int64), self.records[rows]